@@ -1,6 +1,6 @@
 import os
 import json
-from groq import Groq, APIStatusError, APIConnectionError
+from groq import APIStatusError, APIConnectionError
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
 import asyncio
 from langchain_groq import ChatGroq
@@ -9,16 +9,17 @@ import pytz
 import calendar
 from services.google_calendar_service import refresh_and_get_service
 from services.google_calendar_service import list_upcoming_events, create_calendar_event
+from groq_client import get_groq, get_async_groq
 from Intent_prompts import ENHANCER_PROMPT_PROD, Video_Search_Prompt, Web_Search_Prompt, GET_CLEANED_QUERY_PROMPT, GOOGLE_CALENDAR_INTENT_PARSER_PROMPT
 
 
-def classify_query_groq(query: str, chat_context: str = "", verbose: bool = False) -> str:
-    """
-    Classifies a query using LLaMA-4 via Groq API based on context.
-    Returns raw output from Groq without validation.
-    """
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+CLASSIFIER_MODEL = "meta-llama/llama-4-maverick-17b-128e-instruct"
+SEARCH_ELIGIBLE_CLASSIFICATIONS = ["not food related", "food generalized", "respond based on chat history"]
+
 
+# Each Groq helper has a sync version (scripts, scores.py) and an async one (handle_message);
+# both build the same messages and share one pooled client from groq_client.py.
+def _classification_messages(query: str, chat_context: str = "", verbose: bool = False) -> list:
     system_prompt = ENHANCER_PROMPT_PROD  # Swap with DEBUG if needed
 
     full_input = f"""سياق المحادثة السابق:
@@ -30,36 +31,52 @@ def classify_query_groq(query: str, chat_context: str = "", verbose: bool = Fals
     if verbose or os.getenv("VERBOSE_LOGS") == "true":
         print("\n[Intent Classifier Input]\n", full_input)
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": full_input},
     ]
 
-    try:
-        chat_completion = client.chat.completions.create(
-            messages=messages,
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            temperature=0.0,
-        )
-        result = chat_completion.choices[0].message.content.strip()
-        return result
 
+def _classification_error(e: APIStatusError) -> str:
+    """413 becomes a marker the caller can handle; anything else is re-raised (429 included, see handle_message)."""
+    if e.status_code == 413:
+        return "⚠️ input too long"
+    if e.status_code != 429:
+        print(f"🔥 Unhandled Groq Error: {e}")
+    raise e
+
+
+def classify_query_groq(query: str, chat_context: str = "", verbose: bool = False) -> str:
+    """
+    Classifies a query using LLaMA-4 via Groq API based on context.
+    Returns raw output from Groq without validation.
+    """
+    messages = _classification_messages(query, chat_context, verbose)
+    try:
+        chat_completion = get_groq().chat.completions.create(messages=messages, model=CLASSIFIER_MODEL, temperature=0.0)
+        return chat_completion.choices[0].message.content.strip()
     except APIStatusError as e:
-        if e.status_code == 413:
-            return "⚠️ input too long"
-        elif e.status_code == 429:
-            raise APIStatusError("Rate limit hit", status_code=429)
-        else:
-            print(f"🔥 Unhandled Groq Error: {e}")
-            raise
+        return _classification_error(e)
+    except APIConnectionError as e:
+        print(f"🌐 APIConnectionError: {e}")
+        raise
 
+
+async def aclassify_query_groq(query: str, chat_context: str = "", verbose: bool = False) -> str:
+    """Async classify_query_groq() for the WebSocket path."""
+    messages = _classification_messages(query, chat_context, verbose)
+    try:
+        chat_completion = await get_async_groq().chat.completions.create(
+            messages=messages, model=CLASSIFIER_MODEL, temperature=0.0)
+        return chat_completion.choices[0].message.content.strip()
+    except APIStatusError as e:
+        return _classification_error(e)
     except APIConnectionError as e:
         print(f"🌐 APIConnectionError: {e}")
         raise
 
-def extract_video_search(user_input: str, selected_title: str = "") -> str:
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
+def _video_search_messages(user_input: str, selected_title: str = "") -> list:
     system_prompt = Video_Search_Prompt
 
     if selected_title:
@@ -71,17 +88,27 @@ def extract_video_search(user_input: str, selected_title: str = "") -> str:
 
     prompt = f"رسالة المستخدم: {user_input}"
 
-    messages = [
+    return [
         {"role": "system", "content": system_prompt},
         {"role": "user", "content": prompt}
     ]
 
-    response = client.chat.completions.create(
-        messages=messages,
-        model="meta-llama/llama-4-maverick-17b-128e-instruct",
+
+def extract_video_search(user_input: str, selected_title: str = "") -> str:
+    response = get_groq().chat.completions.create(
+        messages=_video_search_messages(user_input, selected_title),
+        model=CLASSIFIER_MODEL,
         temperature=0.0,
     )
+    return response.choices[0].message.content.strip()
 
+
+async def aextract_video_search(user_input: str, selected_title: str = "") -> str:
+    response = await get_async_groq().chat.completions.create(
+        messages=_video_search_messages(user_input, selected_title),
+        model=CLASSIFIER_MODEL,
+        temperature=0.0,
+    )
     return response.choices[0].message.content.strip()
 
 
@@ -107,34 +134,47 @@ def get_chat_context_string(chat_context, n_turns: int = 3) -> str:
 
 
 
-def extract_web_search(user_input: str, chat_context: str = "", verbose: bool = False) -> str:
-    """
-    Extracts a Google-style web search query from the user's message.
-    Optionally uses chat history for follow-up queries.
-    """
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-    system_prompt = Web_Search_Prompt
-
+def _web_search_messages(user_input: str, chat_context: str = "", verbose: bool = False) -> list:
     prompt = f"""سياق المحادثة السابق:
 {chat_context}
 
 رسالة المستخدم:
 {user_input}"""
 
-    messages = [
-        {"role": "system", "content": system_prompt},
+    if verbose or os.getenv("VERBOSE_LOGS") == "true":
+        print("\n[Web Search Extractor Input]\n", prompt)
+
+    return [
+        {"role": "system", "content": Web_Search_Prompt},
         {"role": "user", "content": prompt}
     ]
 
-    if verbose or os.getenv("VERBOSE_LOGS") == "true":
-        print("\n[Web Search Extractor Input]\n", prompt)
 
+def extract_web_search(user_input: str, chat_context: str = "", verbose: bool = False) -> str:
+    """
+    Extracts a Google-style web search query from the user's message.
+    Optionally uses chat history for follow-up queries.
+    """
+    messages = _web_search_messages(user_input, chat_context, verbose)
     try:
-        response = client.chat.completions.create(
-            messages=messages,
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
-            temperature=0.0,
-        )
+        response = get_groq().chat.completions.create(messages=messages, model=CLASSIFIER_MODEL, temperature=0.0)
+        return response.choices[0].message.content.strip()
+
+    except APIStatusError as e:
+        print(f"🔥 Groq API Error: {e}")
+        raise
+
+    except APIConnectionError as e:
+        print(f"🌐 Connection Error: {e}")
+        raise
+
+
+async def aextract_web_search(user_input: str, chat_context: str = "", verbose: bool = False) -> str:
+    """Async extract_web_search() for the WebSocket path."""
+    messages = _web_search_messages(user_input, chat_context, verbose)
+    try:
+        response = await get_async_groq().chat.completions.create(
+            messages=messages, model=CLASSIFIER_MODEL, temperature=0.0)
         return response.choices[0].message.content.strip()
 
     except APIStatusError as e:
@@ -154,6 +194,37 @@ def format_web_results_for_memory(results):
     return formatted.strip()
 
 
+def _cleaned_query_messages(user_input: str, last_bot_response: str = "", verbose: bool = False) -> list:
+    # 🧠 Construct the user prompt from LLM's last response and user's follow-up
+    full_input = f"""آخر رد من المساعد: {last_bot_response}
+رسالة المستخدم: {user_input}"""
+
+    if verbose or os.getenv("VERBOSE_LOGS") == "true":
+        print("\n[Search Intent Extractor Input]\n", full_input)
+
+    return [
+        {"role": "system", "content": GET_CLEANED_QUERY_PROMPT},
+        {"role": "user", "content": full_input}
+    ]
+
+
+def _parse_cleaned_query(response) -> dict:
+    print(f"🧾 LLM raw output for cleaned query:\n{response}\n")
+    content = response.choices[0].message.content.strip()
+
+    # Extract JSON payload from markdown block if present
+    if "```json" in content:
+        json_str = content.split("```json")[1].split("```")[0].strip()
+    else:
+        json_str = content
+
+    result = json.loads(json_str)
+
+    if result.get("type") in ["video", "web", "none"] and "query" in result:
+        return result
+    return {"type": "none", "query": ""}
+
+
 def extract_cleaned_query_for_search(user_input: str, last_bot_response: str = "", query_classification: str = "", verbose: bool = False) -> dict:
     """
     Uses Groq LLM to extract whether a user is requesting a video/web search
@@ -165,46 +236,38 @@ def extract_cleaned_query_for_search(user_input: str, last_bot_response: str = "
             "query": "search keywords or empty string"
         }
     """
-    client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+    # 🛑 Only invoke the LLM if the classification is eligible for possible search (not e.g. a direct dish name)
+    if query_classification not in SEARCH_ELIGIBLE_CLASSIFICATIONS:
+        return {"type": "none", "query": ""}
 
-    # 🧠 Construct the user prompt from LLM's last response and user's follow-up
-    full_input = f"""آخر رد من المساعد: {last_bot_response}
-رسالة المستخدم: {user_input}"""
+    messages = _cleaned_query_messages(user_input, last_bot_response, verbose)
+    try:
+        response = get_groq().chat.completions.create(messages=messages, model=CLASSIFIER_MODEL, temperature=0.0)
+        return _parse_cleaned_query(response)
 
-    if verbose or os.getenv("VERBOSE_LOGS") == "true":
-        print("\n[Search Intent Extractor Input]\n", full_input)
+    except APIStatusError as e:
+        print(f"🔥 Groq API Error: {e}")
+        raise
 
-    messages = [
-        {"role": "system", "content": GET_CLEANED_QUERY_PROMPT},
-        {"role": "user", "content": full_input}
-    ]
+    except APIConnectionError as e:
+        print(f"🌐 Connection Error: {e}")
+        raise
 
-    try:
-        # Only invoke the LLM if the classification is eligible for possible search
-        if query_classification in ["not food related", "food generalized", "respond based on chat history"]:
-            response = client.chat.completions.create(
-                messages=messages,
-                model="meta-llama/llama-4-maverick-17b-128e-instruct",
-                temperature=0.0,
-            )
-            print(f"🧾 LLM raw output for cleaned query:\n{response}\n")
-            content = response.choices[0].message.content.strip()
-
-            # Extract JSON payload from markdown block if present
-            if "```json" in content:
-                json_str = content.split("```json")[1].split("```")[0].strip()
-            else:
-                json_str = content
+    except Exception as e:
+        print(f"❌ Unexpected parsing error: {e}")
+        return {"type": "none", "query": ""}
 
-            result = json.loads(json_str)
 
-            if result.get("type") in ["video", "web", "none"] and "query" in result:
-                return result
-            else:
-                return {"type": "none", "query": ""}
-        else:
-            # 🛑 Skip search detection for irrelevant categories like direct dish name
-            return {"type": "none", "query": ""}
+async def aextract_cleaned_query_for_search(user_input: str, last_bot_response: str = "", query_classification: str = "", verbose: bool = False) -> dict:
+    """Async extract_cleaned_query_for_search() for the WebSocket path."""
+    if query_classification not in SEARCH_ELIGIBLE_CLASSIFICATIONS:
+        return {"type": "none", "query": ""}
+
+    messages = _cleaned_query_messages(user_input, last_bot_response, verbose)
+    try:
+        response = await get_async_groq().chat.completions.create(
+            messages=messages, model=CLASSIFIER_MODEL, temperature=0.0)
+        return _parse_cleaned_query(response)
 
     except APIStatusError as e:
         print(f"🔥 Groq API Error: {e}")
@@ -221,7 +284,6 @@ def extract_cleaned_query_for_search(user_input: str, last_bot_response: str = "
 
 async def user_intent_calendar_parser(user_input: str, user_id: str, last_bot_response: str = ""):
     try:
-        client = Groq(api_key=os.getenv("GROQ_API_KEY"))
         cairo_tz = pytz.timezone("Africa/Cairo")
         current_datetime_cairo = datetime.now(cairo_tz)
 
@@ -255,8 +317,8 @@ async def user_intent_calendar_parser(user_input: str, user_id: str, last_bot_re
             print(f"{m['role'].capitalize()}: {m['content']}")
 
         # Call Groq LLM
-        response = client.chat.completions.create(
-            model="meta-llama/llama-4-maverick-17b-128e-instruct",
+        response = await get_async_groq().chat.completions.create(
+            model=CLASSIFIER_MODEL,
             messages=messages,
             temperature=0.0,
         )
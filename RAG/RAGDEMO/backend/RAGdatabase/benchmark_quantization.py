@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+
+# Allow importing backend modules (vector_index, ...) when run from RAGdatabase/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_index import NumpyVectorIndex, QuantizedNumpyVectorIndex, normalize_rows, top_indices
+from index_snapshots import IndexSnapshots
+
+# === Configuration ===
+# The real corpus is a few hundred recipes; it is resampled with noise up to bench_rows so
+# recall and memory are measured at the scale the int8 index is meant for.
+bench_rows = int(os.getenv("BENCH_ROWS", "200000"))
+bench_queries = int(os.getenv("BENCH_QUERIES", "200"))
+noise = 0.35  # norm of the noise added to each resampled unit vector
+k = 7  # retrieve_recipes' n_results
+rescore_factors = [1, 2, 4, 8]
+rng = np.random.default_rng(0)
+
+# === Corpus: the real recipe vectors when an index exists, random clustered vectors otherwise ===
+def base_vectors():
+    live_dir = IndexSnapshots().current_dir()
+    if NumpyVectorIndex.exists(live_dir):
+        vectors = np.array(NumpyVectorIndex(live_dir).embeddings)
+        if len(vectors):
+            print(f"📦 Resampling {len(vectors)} indexed recipe vectors")
+            return vectors
+    print("⚠️ No vector index found; using random clustered vectors (dim 768)")
+    return normalize_rows(rng.standard_normal((500, 768)))
+
+def jitter(vectors, rows):
+    picks = vectors[rng.integers(len(vectors), size=rows)]
+    scale = noise / np.sqrt(vectors.shape[1])
+    return normalize_rows(picks + rng.standard_normal(picks.shape).astype(np.float32) * scale)
+
+def megabytes(*arrays):
+    return sum(array.nbytes for array in arrays) / 2 ** 20
+
+def timed_queries(search, queries):
+    started = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, (time.perf_counter() - started) * 1000 / len(queries)
+
+def recall(results, truth):
+    return np.mean([len(set(found) & set(expected)) / len(expected) for found, expected in zip(results, truth)])
+
+
+if __name__ == "__main__":
+    vectors = base_vectors()
+    corpus = jitter(vectors, bench_rows)
+    queries = jitter(vectors, bench_queries)
+    ids = [str(i) for i in range(len(corpus))]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        NumpyVectorIndex.build(ids, corpus, index_dir=index_dir, quantize=True)
+        exact = NumpyVectorIndex(index_dir)
+        quantized = QuantizedNumpyVectorIndex(index_dir)
+
+        # === Float32 baseline: exact top-k is the ground truth ===
+        truth, float_ms = timed_queries(lambda q: exact._top_k(q, k)[0], queries)
+        print(f"\n{len(corpus)} vectors x {corpus.shape[1]} dims, {len(queries)} queries, recall@{k}")
+        print(f"{'variant':<24}{'scanned MB':>12}{'recall':>10}{'ms/query':>10}")
+        print(f"{'float32 exact':<24}{megabytes(exact.embeddings):>12.1f}{1.0:>10.3f}{float_ms:>10.2f}")
+
+        # === int8 codes alone, then int8 candidates rescored from the float32 mmap ===
+        scanned_mb = megabytes(quantized.codes, quantized.scale)
+        found, ms = timed_queries(lambda q: quantized.approximate_top_k(q, k)[0], queries)
+        print(f"{'int8 (no rescoring)':<24}{scanned_mb:>12.1f}{recall(found, truth):>10.3f}{ms:>10.2f}")
+        for factor in rescore_factors:
+            quantized.rescore_factor = factor
+            found, ms = timed_queries(lambda q: quantized._top_k(q, k)[0], queries)
+            print(f"{f'int8 + rescore x{factor}':<24}{scanned_mb:>12.1f}{recall(found, truth):>10.3f}{ms:>10.2f}")
+
+        # === A filtered query only scans the selected rows in either variant ===
+        rows = np.flatnonzero(rng.random(len(corpus)) < 0.1)
+        truth = [rows[top_indices(exact.embeddings[rows] @ q, k)] for q in queries]
+        quantized.rescore_factor = 4
+        found, ms = timed_queries(lambda q: quantized._top_k(q, k, rows)[0], queries)
+        print(f"{'int8 + rescore x4, 10%':<24}{scanned_mb * 0.1:>12.1f}{recall(found, truth):>10.3f}{ms:>10.2f}")
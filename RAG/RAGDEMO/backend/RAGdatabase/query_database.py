@@ -1,70 +1,298 @@
+import hashlib
+import json
 import os
-import re
-import uuid
+import sys
+import time
+import numpy as np
 import chromadb
-from chromadb.utils import embedding_functions
+
+# Allow importing backend modules (vector_index, ...) when run from RAGdatabase/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from vector_index import NumpyVectorIndex, QuantizedNumpyVectorIndex, INDEX_DIR, CHROMA_SPACE, normalize_rows
+from title_index import TitleIndex
+from recipe_store import RecipeStore
+from ingest_pipeline import IngestPipeline, batched, DEFAULT_BATCH_SIZE
+from arabic_text import strip_diacritics
+from ingredient_index import ingredient_tokens, INGREDIENT_PARSER_VERSION
+from recipe_metadata import derive_metadata
+from recipe_tagging import load_prototypes, prototypes_cached, tag_recipes, with_tags
+from recipe_clusters import RecipeClusters
+from index_snapshots import IndexSnapshots, validate_snapshot, chroma_collection_name
+from near_duplicates import minhash_signature, find_duplicates, to_bytes, from_bytes
 
 # === Configuration ===
 model_name = "akhooli/Arabic-SBERT-100K"
 recipe_dir = "recipes_from_pagebreaks"
-collection_name = "recipestest"
+collection_name = "recipestest"  # base name; each version is written to "recipestest_<version>"
+retrieval_backend = os.getenv("RETRIEVAL_BACKEND", "numpy")
+use_int8_codes = os.getenv("VECTOR_QUANTIZATION", "none") == "int8"  # also write int8 codes next to the float32 matrix
+manifest_file = "ingest_manifest.json"
+snapshots = IndexSnapshots(INDEX_DIR)  # each run builds INDEX_DIR/versions/<version>, then swaps CURRENT
+
+# === Content-hash ids: the same recipe text always gets the same id ===
+def content_id(content):
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+def load_manifest(index_dir):
+    manifest_path = os.path.join(index_dir, manifest_file)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def save_manifest(manifest, index_dir):
+    manifest_path = os.path.join(index_dir, manifest_file)
+    os.makedirs(index_dir, exist_ok=True)
+    with open(manifest_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+# === Fields derived from the text: ingredient tokens and filterable metadata ===
+def with_derived_fields(record):
+    ingredients = ingredient_tokens(record["full_text"])
+    return dict(record, ingredients=ingredients, metadata=derive_metadata(record["title"], ingredients))
+
+# === Reader stage: yields new/changed recipes one file at a time ===
+# Files whose size/mtime are unchanged (and still indexed) are not re-read; every file is recorded in `manifest`.
+def read_recipes(previous_manifest, indexed_ids, manifest):
+    seen = set()
+
+    for filename in sorted(os.listdir(recipe_dir)):
+        if not filename.endswith(".txt"):
+            continue
+
+        path = os.path.join(recipe_dir, filename)
+        stat = os.stat(path)
+        previous = previous_manifest.get(filename)
+        if (previous and previous["id"] in indexed_ids
+                and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime):
+            manifest[filename] = previous
+            continue
+
+        with open(path, "r", encoding="utf-8") as file:
+            content = file.read().strip()
+
+        if not content:
+            continue
+
+        recipe_id = content_id(content)
+        manifest[filename] = {"id": recipe_id, "size": stat.st_size, "mtime": stat.st_mtime}
+        if recipe_id in indexed_ids or recipe_id in seen:
+            continue  # touched but identical, or a byte-identical copy of another file
+        seen.add(recipe_id)
+
+        yield with_derived_fields({
+            "id": recipe_id,
+            "title": content.splitlines()[0].strip(),   # ✅ Keep original title with diacritics
+            "full_text": content,                        # ✅ Keep original diacritized content
+        })
+
+# === Load what is already indexed: id -> vector (only ids that also have a stored text) ===
+def load_existing_index(store, index_dir):
+    if not NumpyVectorIndex.exists(index_dir):
+        return {}
+    index = NumpyVectorIndex(index_dir)
+    embeddings = np.array(index.embeddings)  # copy out of the mmap before the files are replaced
+    stored_ids = set(store.ids())
+    return {id_: embeddings[i] for i, id_ in enumerate(index.ids) if id_ in stored_ids}
+
+
+def ingest():
+    started = time.perf_counter()
+
+    # === Build a new snapshot version, seeded from the live one; servers keep reading the live one ===
+    live_dir = snapshots.current_dir()
+    live_count = len(NumpyVectorIndex(live_dir)) if NumpyVectorIndex.exists(live_dir) else 0
+    live_info = snapshots.info(snapshots.current()) if snapshots.current() else {}
+    version, index_dir = snapshots.stage()
+    print(f"🗂️ Building index version {version} (live: {snapshots.current() or 'none'}, {live_count} recipes)")
+
+    store = RecipeStore(index_dir)
+    existing = load_existing_index(store, index_dir)
+    merged = dict(existing)
+    manifest, added = {}, []
+
+    # The staged version gets its own collection; the one being served is never written to
+    collection, chroma_ids = None, set()
+    if retrieval_backend == "chroma":
+        chroma_client = chromadb.HttpClient(host='localhost', port=8000)
+        # Cosine space over unit vectors: the same distances, threshold and scores as the numpy index
+        collection = chroma_client.get_or_create_collection(name=chroma_collection_name(collection_name, version),
+                                                            metadata={"hnsw:space": CHROMA_SPACE})
+        chroma_ids = set(collection.get(include=[])["ids"])
+
+    def drop_collection(name):
+        try:
+            chroma_client.delete_collection(name)
+        except Exception:
+            pass  # never created, or already gone
+
+    # === Writer stage: called once per encoded batch, in order ===
+    # Texts go to the recipe store; vector indexes get ids + vectors only.
+    def write_batch(batch, embeddings):
+        store.upsert_many(batch)
+        for record, embedding in zip(batch, embeddings):
+            merged[record["id"]] = embedding
+            added.append(record["id"])
+        if collection is not None:
+            collection.upsert(ids=[record["id"] for record in batch], embeddings=normalize_rows(embeddings).tolist(),
+                              metadatas=[record["metadata"] for record in batch])
+
+    # === Stream new/changed recipes: read -> remove diacritics -> batched encoding -> batched writes ===
+    pipeline = IngestPipeline(model_name=model_name, normalize=strip_diacritics)
+    previous_manifest = load_manifest(index_dir)
+    # Near-duplicates are stored but not indexed; unchanged files of theirs need no re-read either
+    indexed_ids = set(existing) | set(store.duplicates())
+    stats = pipeline.run(read_recipes(previous_manifest, indexed_ids, manifest), write_batch)
+
+    current_ids = {entry["id"] for entry in manifest.values()}
+    to_delete = [id_ for id_ in merged if id_ not in current_ids]
+    for id_ in to_delete:
+        del merged[id_]
+    store.delete_many([id_ for id_ in store.ids() if id_ not in current_ids])
+
+    # === Backfill derived fields for recipes stored before ingredients/metadata existed ===
+    # (all of them when the ingredient parser changed since the live version was built)
+    if live_count and live_info.get("ingredient_parser") != INGREDIENT_PARSER_VERSION:
+        backfill_ids = sorted(store.ids())
+    else:
+        backfill_ids = sorted(set(store.ids_without_ingredients()) | set(store.ids_without_metadata()))
+    if backfill_ids:
+        store.upsert_many(with_derived_fields(record) for record in store.get_many(backfill_ids).values())
+        print(f"🥕 Derived ingredients and metadata for {len(backfill_ids)} stored recipes.")
+
+    print(f"📂 {len(manifest)} recipe files: {len(added)} new/changed, {len(to_delete)} removed, "
+          f"{len(merged) - len(added)} unchanged.")
+    if added:
+        print(f"⚡ Embedded {stats['docs']} recipes in {stats['seconds']:.2f}s ({stats['docs_per_sec']:.1f} docs/sec)")
+
+    # === Near-duplicates: MinHash signatures + LSH banding, each group collapsed into one canonical recipe ===
+    for batch_ids in batched(store.ids_without_signature(), DEFAULT_BATCH_SIZE):
+        store.save_signatures({id_: to_bytes(minhash_signature(record["full_text"]))
+                               for id_, record in store.get_many(batch_ids).items()})
+    duplicates = find_duplicates({id_: from_bytes(blob) for id_, blob in store.signatures().items()},
+                                 store.text_lengths())
+    duplicates_changed = duplicates != store.duplicates()
+    if duplicates_changed:
+        store.set_duplicates(duplicates)
+    for id_ in duplicates:
+        merged.pop(id_, None)
+
+    # A duplicate whose canonical recipe was removed is indexed again and needs its own vector
+    promoted = [id_ for id_ in store.canonical_ids() if id_ not in merged]
+    if promoted:
+        promoted_metadata = store.get_metadata(promoted)
+        pipeline.run((dict(record, metadata=promoted_metadata[id_]) for id_, record in store.get_many(promoted).items()),
+                     write_batch)
+    if duplicates_changed or promoted:
+        print(f"🪞 {len(duplicates)} near-duplicate recipes collapsed into {len(set(duplicates.values()))} canonical ones"
+              f"{f', {len(promoted)} re-indexed' if promoted else ''}.")
+
+    metadata_changed_ids = []
+    index_complete = (NumpyVectorIndex.exists(index_dir) and NumpyVectorIndex.has_metadata(index_dir)
+                      and prototypes_cached(model_name, index_dir) and RecipeClusters.exists(index_dir)
+                      and QuantizedNumpyVectorIndex.exists(index_dir) == use_int8_codes
+                      and (collection is None or live_info.get("chroma_space") == CHROMA_SPACE))
+    rebuild = bool(added or to_delete or backfill_ids or duplicates_changed or not index_complete)
+    if rebuild:
+        ids = list(merged)
+        matrix = np.array([merged[id_] for id_ in ids])
+        metadata = store.get_metadata(ids)
+        updated = dict(metadata)
 
-# === Function to remove Arabic diacritics ===
-def remove_diacritics(text):
-    arabic_diacritics = re.compile(r'[\u064B-\u0652]')
-    return arabic_diacritics.sub('', text)
+        # === Zero-shot tags: whole corpus x tag prototypes in one matrix product ===
+        tag_started = time.perf_counter()
+        tags, prototypes = load_prototypes(pipeline.encode, model_name, index_dir)
+        for id_, recipe_tags in zip(ids, tag_recipes(matrix, tags, prototypes)):
+            updated[id_] = with_tags(updated[id_], recipe_tags)
+        print(f"🏷️ Tagged {len(ids)} recipes with {len(tags)} prototypes in {time.perf_counter() - tag_started:.2f}s.")
 
-# === Load embedding function ===
-sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name=model_name
-)
+        # === Offline clustering: labelled clusters for "food generalized" requests ===
+        clusters, assignments = RecipeClusters.build(ids, matrix, updated, titles=store.get_titles(ids))
+        for id_, cluster_id in zip(ids, assignments):
+            updated[id_] = dict(updated[id_], cluster=cluster_id)
+        clusters.save(index_dir)
+        print(f"🧩 {len(clusters)} recipe clusters: "
+              + "، ".join(f"{cluster['label']} ({cluster['size']})" for cluster in clusters.clusters))
 
-# === Connect to ChromaDB ===
-chroma_client = chromadb.HttpClient(host='localhost', port=8000)
+        metadata_changed_ids = [id_ for id_ in ids if updated[id_] != metadata[id_]]
+        store.update_metadata({id_: updated[id_] for id_ in metadata_changed_ids})
+        metadata = updated
 
-# === Create or get collection ===
-collection = chroma_client.get_or_create_collection(
-    name=collection_name,
-    embedding_function=sentence_transformer_ef
-)
-print(f"Collection '{collection_name}' is ready.")
+        # === Write the in-process vector index (vectors + ids + metadata filter bitmask) ===
+        NumpyVectorIndex.build(ids=ids, embeddings=[merged[id_] for id_ in ids], index_dir=index_dir,
+                               metadatas=[metadata[id_] for id_ in ids], quantize=use_int8_codes)
+        print(f"{len(ids)} recipes in {'int8 + float32' if use_int8_codes else 'float32'} vector index at '{index_dir}'.")
 
-# === Prepare data ===
-documents, metadatas, ids = [], [], []
+        # === Rebuild the title fast-path index from the recipe store ===
+        aliases = store.alias_titles()
+        TitleIndex.build(store.iter_records(), aliases=aliases).save(index_dir)
+        print(f"Title index rebuilt with {len(ids)} titles and {sum(map(len, aliases.values()))} aliases.")
 
-for filename in os.listdir(recipe_dir):
-    if not filename.endswith(".txt"):
-        continue
+    save_manifest(manifest, index_dir)
+    unchanged = not rebuild and manifest == previous_manifest
 
-    path = os.path.join(recipe_dir, filename)
-    with open(path, "r", encoding="utf-8") as file:
-        content = file.read().strip()
+    # === Fill the version's ChromaDB collection with the same id set, before it is validated ===
+    if collection is not None and not unchanged:
+        # Recipes written by this run that ended up removed or collapsed as near-duplicates
+        stale_ids = [id_ for id_ in chroma_ids | set(added) if id_ not in merged]
+        if stale_ids:
+            collection.delete(ids=stale_ids)
 
-    if not content:
-        continue
+        missing_ids = [id_ for id_ in merged if id_ not in chroma_ids and id_ not in added]
+        for batch_ids in batched(missing_ids, DEFAULT_BATCH_SIZE):
+            metadata = store.get_metadata(batch_ids)
+            collection.upsert(ids=batch_ids, embeddings=normalize_rows([merged[id_] for id_ in batch_ids]).tolist(),
+                              metadatas=[metadata[id_] for id_ in batch_ids])
 
-    lines = content.splitlines()
-    title = lines[0].strip()      # ✅ Keep original title with diacritics
-    body = content.strip()        # ✅ Keep original diacritized content
+        # Records written before their metadata/tags/cluster were final only need the metadata updated
+        stale_metadata = (set(backfill_ids) | set(metadata_changed_ids)) - set(missing_ids)
+        update_ids = [id_ for id_ in merged if id_ in stale_metadata and (id_ in chroma_ids or id_ in added)]
+        for batch_ids in batched(update_ids, DEFAULT_BATCH_SIZE):
+            metadata = store.get_metadata(batch_ids)
+            collection.update(ids=batch_ids, metadatas=[metadata[id_] for id_ in batch_ids])
+        print(f"Collection '{collection.name}': {len(added) + len(missing_ids)} upserted, {len(stale_ids)} deleted.")
 
-    # ✅ Remove diacritics before embedding
-    body_no_diacritics = remove_diacritics(body)
+    # === Validate the new version, then swap it in atomically (or keep the live one) ===
+    if unchanged:
+        snapshots.discard(version)
+        if collection is not None:
+            drop_collection(collection.name)
+        print(f"✅ Index unchanged; version {snapshots.current()} stays live.")
+    else:
+        problems = validate_snapshot(index_dir, list(merged), encode=pipeline.encode, live_count=live_count)
+        if collection is not None and collection.count() != len(merged):
+            problems.append(f"collection '{collection.name}' has {collection.count()} records, expected {len(merged)}")
+        if problems:
+            snapshots.discard(version)
+            if collection is not None:
+                drop_collection(collection.name)
+            for problem in problems:
+                print(f"❌ {problem}")
+            sys.exit(f"Index version {version} failed validation; version {snapshots.current()} stays live.")
+        chroma_info = {"chroma_collection": collection.name, "chroma_space": CHROMA_SPACE} if collection is not None else {}
+        removed = snapshots.publish(version, recipes=len(merged), model=model_name, int8=use_int8_codes,
+                                    ingredient_parser=INGREDIENT_PARSER_VERSION, **chroma_info)
+        if collection is not None:
+            for old_version in removed:
+                drop_collection(chroma_collection_name(collection_name, old_version))
+        print(f"🔄 Index version {version} is live ({len(merged)} recipes); "
+              f"{len(snapshots.versions()) - 1} earlier versions kept for rollback.")
 
-    documents.append(body_no_diacritics)
+    print(f"✅ Ingestion finished in {time.perf_counter() - started:.2f}s.")
 
-    # ✅ Store diacritized title & body in metadata
-    metadatas.append({
-        "title": title,
-        "full_text": body
-    })
 
-    ids.append(str(uuid.uuid4()))
+# === Rollback: point CURRENT back at an earlier version (servers pick it up on their next query) ===
+def rollback(version=None):
+    version = snapshots.rollback(version)
+    print(f"⏪ Index version {version} is live again ({snapshots.info(version)['recipes']} recipes).")
+    print("Versions: " + ", ".join(snapshots.versions()))
 
-# === Add to ChromaDB ===
-collection.add(
-    documents=documents,
-    metadatas=metadatas,
-    ids=ids
-)
 
-print(f"{len(documents)} recipes added to collection '{collection_name}'.")
+if __name__ == "__main__":
+    # python query_database.py              -> ingest into a new version
+    # python query_database.py --rollback [version]
+    if len(sys.argv) > 1 and sys.argv[1] == "--rollback":
+        rollback(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        ingest()
@@ -3,17 +3,17 @@ import arabic_reshaper
 from bidi.algorithm import get_display
 from fuzzywuzzy import fuzz
 from chromadb.utils import embedding_functions
-import re
+import os
+import sys
+
+# Allow importing backend modules when run from RAGdatabase/
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from arabic_text import strip_diacritics
 
 # === Config ===
 model_name = "akhooli/Arabic-SBERT-100K"
 collection_name = "recipestest"
 
-# === Diacritics removal ===
-def remove_diacritics(text):
-    arabic_diacritics = re.compile(r'[\u064B-\u0652]')
-    return arabic_diacritics.sub('', text)
-
 # === Load embedding function ===
 sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
     model_name=model_name
@@ -33,7 +33,7 @@ def search_recipe(query_text: str, top_k: int = 5):
         query_text = "وصفة " + query_text
 
     # ✅ Normalize user query (remove diacritics before embedding)
-    stripped_query = remove_diacritics(query_text)
+    stripped_query = strip_diacritics(query_text)
 
     results = collection.query(
         query_texts=[stripped_query],
@@ -1,12 +1,10 @@
 import asyncio
-import os
 from langchain_groq import ChatGroq # Not used in this snippet, but kept for context
-from groq import Groq
+from groq_client import get_async_groq
 from datetime import datetime, timedelta
 import json 
 
 async def user_intent_calendar_parser(user_input: str) -> dict:
-    client = Groq(api_key= os.getenv("GROQ_API_KEY"))
 
     # Your system_prompt definition remains the same (it's well-structured!)
     system_prompt = """
@@ -126,7 +124,7 @@ async def user_intent_calendar_parser(user_input: str) -> dict:
     )
 
     try:
-        response = client.chat.completions.create(
+        response = await get_async_groq().chat.completions.create(
             model="meta-llama/llama-4-maverick-17b-128e-instruct",
             messages=[
                 {"role": "system", "content": formatted_prompt},
@@ -1,18 +1,19 @@
-from langchain.chains import LLMChain
-from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage
 from langchain.chains.conversation.memory import ConversationBufferMemory
-from langchain_groq import ChatGroq
-from langchain.schema import HumanMessage, AIMessage, SystemMessage
+from langchain.schema import HumanMessage, AIMessage
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
+import asyncio
 import json
 import os
-from chroma_utils import retrieve_data, is_recipe_in_kb
-from Intent_classifier_new import classify_query_groq, extract_video_search, extract_web_search, get_chat_context_string, format_web_results_for_memory
+from chroma_utils import (aretrieve_recipes, asuggest_from_cluster, match_title, get_recipe_text,
+                          abuild_preference_vector, aembed_query)
+from Intent_classifier_new import aclassify_query_groq, aextract_video_search, aextract_web_search, get_chat_context_string, format_web_results_for_memory
+from intent_knn import aclassify_locally, FIXED_INTENTS
 from Test_parser_calendar import user_intent_calendar_parser
 from groq import APIStatusError
 from groq import APIConnectionError
+from groq_client import get_async_groq
+from arabic_text import normalize_arabic
 from Search import google_search, scrape_webpage_content, search_youtube_videos
 from services.google_calendar_service import (
     refresh_and_get_service,
@@ -28,6 +29,8 @@ from services.database import USERS_COLLECTION
 from bson import ObjectId
 # --- END NEW IMPORTS ---
 
+LLM_ROLES = {"ai": "assistant", "system": "system"}  # LangChain message type -> chat API role (others: user)
+
 def parse_relative_date(time_frame: str) -> Optional[str]:
     """Converts relative time frames (today, tomorrow, next week) to YYYY-MM-DD."""
     today = datetime.now()
@@ -129,14 +132,25 @@ class WebSocketBotSession:
         self.user_name = None
         self.user_gender = None
         self.user_profession = None
+        self.user_likes = []
+        self.user_dislikes = []
+        self.user_allergies = []
+        self.user_favorite_recipes = []
+        self.preference_vector = None  # Taste profile for re-ranking; built lazily from likes/favorites/dislikes
+        self._preference_stale = True
         self.mode = None
-        self.retrieved_documents = {}  # Holds full recipes keyed by title
+        self.suggestion_ids = {}  # Suggestion title -> recipe id; the body is loaded only when chosen
+        self.last_retrieval = None  # RetrievalResult of the latest recipe turn
         self.last_user_query = None
         self.groq_api_key = os.getenv("GROQ_API_KEY")
         self.model = 'meta-llama/llama-4-maverick-17b-128e-instruct'
-        self.groq_chat = ChatGroq(groq_api_key=self.groq_api_key, model_name=self.model)
+        self.temperature = 0.7  # what the replies used through ChatGroq; the API default would be 1.0
         self.chat_history = []
         self.system_prompt = "..."
+        self._system_message = {"role": "system", "content": self.system_prompt}  # rebuilt only when the prompt changes
+        self._history_sources = []  # memory messages already converted, in order
+        self._history_messages = []  # their role/content dicts, reused on every turn
+        self.on_delta = None  # async callback(text) set by main.py; generated replies are streamed through it
         self.google_calendar_connected = False
 
 
@@ -451,6 +465,7 @@ class WebSocketBotSession:
         self.user_dislikes = dislikes or []
         self.user_allergies = allergies or []
         self.user_favorite_recipes = favorite_recipes or []
+        self._preference_stale = True
         self.google_calendar_connected = google_calendar_connected
         self._update_system_prompt()
 
@@ -606,6 +621,7 @@ class WebSocketBotSession:
 """
 
         self.system_prompt = core_prompt.strip()
+        self._system_message = {"role": "system", "content": self.system_prompt}
 
 
     async def handle_message(self, user_input: str):
@@ -613,10 +629,41 @@ class WebSocketBotSession:
         self.last_user_input = user_input
         self.original_question = user_input
 
+        # The message is embedded once, and retrieval for the raw message starts now, both
+        # overlapping the classifier round trip. The dish path reuses the retrieval when it can;
+        # it is cancelled as soon as the intent turns out to be anything else.
+        embedding = asyncio.create_task(aembed_query(user_input))
+        prefetch = asyncio.create_task(self._prefetch_retrieval(user_input, embedding))
+        try:
+            return await self._dispatch_message(user_input, embedding, prefetch)
+        finally:
+            for task in (prefetch, embedding):
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # a failure was already reported where it mattered
+
+    async def _prefetch_retrieval(self, user_input: str, embedding: asyncio.Task):
+        """Speculative recipe retrieval for the raw message, exactly as the dish path would run it."""
+        try:
+            profile = await self._retrieval_profile()
+            title_hit = match_title(user_input, **profile)
+            if title_hit is not None:
+                return title_hit
+            # Shielded: cancelling the retrieval must not cancel the embedding the other paths share
+            await asyncio.shield(embedding)
+            return await aretrieve_recipes(user_input, **profile)
+        except Exception as e:
+            print(f"⚠️ Speculative retrieval failed: {e}")
+            return None
+
+    async def _dispatch_message(self, user_input: str, embedding: asyncio.Task, prefetch: asyncio.Task):
         n = min(len(self.chat_history), 5)
         recent_context = self.get_recent_chat_context(n=n)
         try:
-            query_result = classify_query_groq(user_input, chat_context=recent_context)
+            # Confident local kNN answers skip the Groq round trip; everything else goes to the LLM
+            query_result = (await aclassify_locally(user_input, recent_context, embedding=embedding)
+                            or await aclassify_query_groq(user_input, chat_context=recent_context))
             self.memory.chat_memory.add_user_message(user_input)
 
         except APIConnectionError as e:
@@ -637,6 +684,23 @@ class WebSocketBotSession:
 
         print(f"🧠 Query Enhancer Output:\n{query_result}\n")
 
+        if query_result in FIXED_INTENTS:
+            # Not a dish: the speculative retrieval is wasted work, and only the cluster path
+            # below still reads the message embedding
+            prefetch.cancel()
+            if query_result != "food generalized":
+                embedding.cancel()
+
+        if query_result == "food generalized":
+            # Vague food requests ("أنا عايز شوربة") get concrete suggestions from the nearest recipe cluster
+            await asyncio.wait({embedding})  # only the message embedding, which the cluster lookup reads from the cache
+            retrieval = await asuggest_from_cluster(user_input, **await self._retrieval_profile())
+            if retrieval is not None and retrieval.hits:
+                self.last_retrieval = retrieval
+                self.selected_title = None
+                return self._suggestions_response(
+                    retrieval, f"دي شوية اختيارات من {retrieval.cluster_label}، اختر رقم:")
+
         if query_result in ["not food related", "respond based on chat history", "food generalized"]:
             print("🔍 Passing message directly to LLM without retrieval.\n")
             self.selected_title = None
@@ -666,7 +730,7 @@ class WebSocketBotSession:
 
             try:
                 # 3. Extract the query using both the user input and the real context
-                video_query = extract_video_search(user_input, selected_title=context)
+                video_query = await aextract_video_search(user_input, selected_title=context)
                 print(f"🔎 Cleaned YouTube search query: '{video_query}'")
 
                 video_results = search_youtube_videos(video_query)
@@ -701,7 +765,7 @@ class WebSocketBotSession:
                 print(f"[User Input]: {user_input}")
                 print(f"[Chat Context]:\n{chat_context_str}")
 
-                web_query = extract_web_search(user_input, chat_context=chat_context_str, verbose=True)
+                web_query = await aextract_web_search(user_input, chat_context=chat_context_str, verbose=True)
                 print(f"🔎 Cleaned Google query: '{web_query}'")
 
                 web_results = await google_search(web_query)
@@ -855,36 +919,73 @@ class WebSocketBotSession:
                 # If not, you'll need to implement it or inline the web search logic
                 return await self.handle_web_search(user_input) # This line might need adjustment if handle_web_search is not defined
 
-        if not is_recipe_in_kb(query_result):
+        # A confident title-index hit needs no embedding at all; otherwise one embedding +
+        # one KB query answers both "is it in the KB?" and "which recipes?"
+        # Recipes with the user's allergens never become suggestions; disliked ingredients are flagged.
+        retrieval = None
+        if normalize_arabic(query_result) == normalize_arabic(user_input):
+            retrieval = await prefetch
+            if retrieval is not None:
+                print("⚡ Reusing the speculative retrieval of the raw message")
+        else:
+            prefetch.cancel()
+        if retrieval is None:
+            profile = await self._retrieval_profile()
+            retrieval = match_title(query_result, **profile) or await aretrieve_recipes(query_result, **profile)
+        self.last_retrieval = retrieval
+
+        if not retrieval.in_kb:
             print(f"⚠️ Recipe '{query_result}' not found in KB. Using fallback LLM generation.")
             return await self._generate_response(user_input, f"هاتلي وصفة {query_result} بالتفصيل")
 
-        documents = retrieve_data(query_result)
-        if not documents:
+        if not retrieval.hits and retrieval.excluded:
+            print(f"⚠️ All {retrieval.excluded} matching recipes contain the user's allergens.")
+            return await self._generate_response(
+                user_input,
+                f"كل وصفات {query_result} اللي عندنا فيها مكونات المستخدم عنده حساسية منها "
+                f"({'، '.join(self.user_allergies)}). اقترح بديل آمن من غير المكونات دي."
+            )
+
+        if not retrieval.hits:
             print("⚠️ No documents found. Responding with fallback.")
             return await self._generate_response(user_input, "لم أتمكن من العثور على وصفات مناسبة.")
 
-        unique_titles = []
-        seen = set()
-
-        for doc in documents:
-            title = doc["title"]
-            if title not in seen:
-                seen.add(title)
-                unique_titles.append(title)
+        return self._suggestions_response(retrieval, "اختر رقم من الاختيارات التالية:")
 
-        self.suggestions = unique_titles + ["❌ لا أريد أي من هذه الخيارات"]
-        self.retrieved_documents = {doc["title"]: doc["document"] for doc in documents}
+    async def _retrieval_profile(self) -> Dict[str, Any]:
+        """
+        Retrieval arguments from the user's profile: allergens are excluded, dislikes are flagged,
+        and the preference vector re-ranks candidates. The vector is embedded once per profile change.
+        """
+        if self._preference_stale:
+            liked = list(self.user_likes) + [
+                fav["title"] if isinstance(fav, dict) else str(fav)
+                for fav in self.user_favorite_recipes if fav
+            ]
+            self.preference_vector = await abuild_preference_vector(liked, self.user_dislikes)
+            self._preference_stale = False
+        return {"allergies": self.user_allergies, "dislikes": self.user_dislikes,
+                "preference": self.preference_vector}
+
+    def _suggestions_response(self, retrieval, message: str) -> Dict[str, Any]:
+        self.suggestions = retrieval.unique_titles() + ["❌ لا أريد أي من هذه الخيارات"]
+        self.suggestion_ids = retrieval.title_ids()
         self.expecting_choice = True
 
         print("📋 Recipe Titles Found:")
         for i, title in enumerate(self.suggestions, 1):
             print(f"{i}. {title}")
 
+        disliked = retrieval.disliked()
+        if disliked:
+            notes = "\n".join(f"⚠️ {title}: فيها {'، '.join(items)}" for title, items in disliked.items())
+            message = f"{message}\n{notes}"
+
         return {
             "type": "suggestions",
-            "message": "اختر رقم من الاختيارات التالية:",
-            "suggestions": self.suggestions
+            "message": message,
+            "suggestions": self.suggestions,
+            "disliked": disliked
         }
 
     async def handle_choice(self, choice_index: int):
@@ -894,6 +995,7 @@ class WebSocketBotSession:
             print("🚫 User rejected all suggestions.")
             self.expecting_choice = False
             self.suggestions = []
+            self.suggestion_ids = {}
             return await self._generate_response(self.original_question,
                                                  "لم يتم اختيار أي وصفة. يمكنك التحدث بحرية الآن.")
 
@@ -901,12 +1003,19 @@ class WebSocketBotSession:
             selected_title = self.suggestions[choice_index]
             print(f"✅ Selected Recipe Title: {selected_title}")
 
-            retrieved_data = self.retrieved_documents[selected_title]
+            retrieved_data = get_recipe_text(self.suggestion_ids[selected_title])
+            if retrieved_data is None:
+                print(f"⚠️ Recipe '{selected_title}' is no longer in the store.")
+                return {
+                    "type": "error",
+                    "message": "الوصفة دي مش متاحة دلوقتي. جرب تطلبها تاني."
+                }
             print(f"📦 Retrieved Full Recipe:\n{retrieved_data}\n")
 
             self.selected_title = selected_title
             self.expecting_choice = False
             self.suggestions = []  # 🛠️ ADD THIS to clear suggestions safely
+            self.suggestion_ids = {}
 
             response = await self._generate_response(self.original_question, retrieved_data)
             response["selected_title"] = selected_title  # ✅ Good
@@ -921,36 +1030,39 @@ class WebSocketBotSession:
                 "message": "اختيار غير صالح. حاول رقم تاني."
             }
 
+    def _sync_history_messages(self):
+        """
+        Keeps the role/content dicts for the LLM in step with the memory. Messages the trim removed
+        are dropped by identity and messages added since the last turn are converted and appended;
+        the list is rebuilt only when the memory was replaced, so no message is converted twice,
+        also once the memory is trimmed on every turn.
+        """
+        messages = self.memory.chat_memory.messages
+        alive = {id(message) for message in messages}
+        if any(id(source) not in alive for source in self._history_sources):
+            kept = [i for i, source in enumerate(self._history_sources) if id(source) in alive]
+            self._history_sources = [self._history_sources[i] for i in kept]
+            self._history_messages = [self._history_messages[i] for i in kept]
+        known = len(self._history_sources)
+        if len(messages) < known or any(a is not b for a, b in zip(messages, self._history_sources)):
+            self._history_sources, self._history_messages, known = [], [], 0
+        for message in messages[known:]:
+            role = LLM_ROLES.get(message.type, "user")
+            self._history_sources.append(message)
+            self._history_messages.append({"role": role, "content": message.content})
+
     async def _generate_response(self, user_input: str, retrieved_data: str):
         self.trim_memory_user_assistant_only()
-
-        prompt = ChatPromptTemplate.from_messages([
-            SystemMessage(content=self.system_prompt),
-            MessagesPlaceholder(variable_name="chat_history"),
-            HumanMessagePromptTemplate.from_template("{human_input}"),
-        ])
-
-        chat_history = self.memory.load_memory_variables({})["chat_history"]
-        print(f"📚 Chat History Size: {len(chat_history)}")
-
-        full_prompt = prompt.format_messages(
-            chat_history=chat_history,
-            human_input=user_input
-        )
-
-        print("🧠 Prompt Sent to LLM:")
-        print(full_prompt)
+        self._sync_history_messages()
+        print(f"📚 Chat History Size: {len(self._history_messages)}")
 
         conversation_input = f"Retrieved Data: {retrieved_data}\nUser Question: {user_input}"
+        full_prompt = [self._system_message, *self._history_messages, {"role": "user", "content": conversation_input}]
+        print(f"🧠 Prompt Sent to LLM: {len(full_prompt)} messages, {len(conversation_input)} chars of new input")
 
-        conversation = LLMChain(
-            llm=self.groq_chat,
-            prompt=prompt,
-            verbose=False,
-            memory=self.memory,
-        )
         try:
-            response = conversation.predict(human_input=conversation_input)
+            response = await self._stream_completion(full_prompt)
+            self.memory.save_context({"human_input": conversation_input}, {"text": response})
             print("💬 Chatbot Response:\n", response)
             if not response.strip():
                 print("⚠️ Empty response from LLM — possibly failed silently.")
@@ -983,3 +1095,21 @@ class WebSocketBotSession:
                 "message": "🌐 Lost connection to the assistant. Please reconnect."
             }
 
+    async def _stream_completion(self, messages) -> str:
+        """
+        Streams the reply and forwards every token delta through `on_delta` as it arrives, so
+        the user starts reading after the first token; returns the full text for the final
+        "response" message, the memory and chat_history.
+        """
+        stream = await get_async_groq().chat.completions.create(model=self.model, messages=messages,
+                                                                temperature=self.temperature, stream=True)
+        parts = []
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            if self.on_delta is not None:
+                await self.on_delta(delta)
+        return "".join(parts)
+
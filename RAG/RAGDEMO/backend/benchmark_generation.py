@@ -0,0 +1,109 @@
+import asyncio
+import os
+import time
+import tracemalloc
+
+from langchain.chains import LLMChain
+from langchain_core.prompts import ChatPromptTemplate, HumanMessagePromptTemplate, MessagesPlaceholder
+from langchain_core.messages import SystemMessage
+from langchain_groq import ChatGroq
+from WebSocket_scrap import WebSocketBotSession
+
+# === Configuration ===
+# Per-turn prompt assembly of the previous LangChain path (template + LLMChain built every
+# turn, prompt formatted once to print and again inside predict) against the direct path
+# (prebuilt system message, incrementally synced history dicts). No network by default;
+# BENCH_LIVE=1 also measures time to first token and total latency against the Groq API.
+bench_sessions = int(os.getenv("BENCH_SESSIONS", "200"))
+bench_turns = int(os.getenv("BENCH_TURNS", "10"))
+bench_live = os.getenv("BENCH_LIVE", "0") == "1"
+live_requests = 5
+bench_model = 'meta-llama/llama-4-maverick-17b-128e-instruct'  # WebSocketBotSession.model
+retrieved_data = "وصفة: شوربة عدس\nالمكونات: عدس أصفر، بصل، جزر، كمون\nطريقة التحضير: ..." * 4
+user_input = "عايز اعمل شوربة عدس النهارده"
+
+# === Paths under test ===
+def langchain_turn(session, llm):
+    """The pre-streaming _generate_response up to the network call."""
+    session.trim_memory_user_assistant_only()
+    prompt = ChatPromptTemplate.from_messages([
+        SystemMessage(content=session.system_prompt),
+        MessagesPlaceholder(variable_name="chat_history"),
+        HumanMessagePromptTemplate.from_template("{human_input}"),
+    ])
+    chat_history = session.memory.load_memory_variables({})["chat_history"]
+    prompt.format_messages(chat_history=chat_history, human_input=user_input)
+    conversation_input = f"Retrieved Data: {retrieved_data}\nUser Question: {user_input}"
+    conversation = LLMChain(llm=llm, prompt=prompt, verbose=False, memory=session.memory)
+    # What predict() does before calling the model
+    return conversation.prep_prompts([conversation.prep_inputs({"human_input": conversation_input})])
+
+def direct_turn(session, llm=None):
+    """The current _generate_response up to the network call."""
+    session.trim_memory_user_assistant_only()
+    session._sync_history_messages()
+    conversation_input = f"Retrieved Data: {retrieved_data}\nUser Question: {user_input}"
+    return [session._system_message, *session._history_messages, {"role": "user", "content": conversation_input}]
+
+def new_sessions():
+    sessions = []
+    for i in range(bench_sessions):
+        session = WebSocketBotSession(user_id=f"bench-{i}", db=None)
+        session.set_user_info(name="سعاد", gender="female", likes=["ملوخية"], allergies=["فول سوداني"])
+        sessions.append(session)
+    return sessions
+
+def run(turn, llm):
+    sessions = new_sessions()
+    tracemalloc.start()
+    started = time.perf_counter()
+    for _ in range(bench_turns):
+        for session in sessions:
+            turn(session, llm)
+            session.memory.save_context({"human_input": f"Retrieved Data: {retrieved_data}\nUser Question: {user_input}"},
+                                        {"text": "تمام، دي طريقة شوربة العدس ..."})
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed * 1000 / (bench_sessions * bench_turns), peak / 2 ** 20
+
+# === Live latency (optional) ===
+async def live(llm):
+    """Blocking-style LLMChain call against the streamed direct call: total latency and time to first token."""
+    session = new_sessions()[0]
+    messages = direct_turn(session)
+    chain = LLMChain(llm=llm, prompt=ChatPromptTemplate.from_messages([
+        SystemMessage(content=session.system_prompt),
+        HumanMessagePromptTemplate.from_template("{human_input}"),
+    ]), verbose=False)
+    first_token = []
+
+    async def mark_first(delta):
+        if not first_token:
+            first_token.append(time.perf_counter())
+
+    session.on_delta = mark_first
+    calls = (("LLMChain.apredict", lambda: chain.apredict(human_input=messages[-1]["content"])),
+             ("direct stream", lambda: session._stream_completion(messages)))
+    for name, call in calls:
+        totals, firsts = [], []
+        for _ in range(live_requests):
+            first_token.clear()
+            started = time.perf_counter()
+            await call()
+            finished = time.perf_counter()
+            totals.append(finished - started)
+            firsts.append((first_token[0] if first_token else finished) - started)
+        print(f"{name:<18} first token {1000 * sum(firsts) / live_requests:7.0f} ms   "
+              f"total {1000 * sum(totals) / live_requests:7.0f} ms")
+
+
+if __name__ == "__main__":
+    llm = ChatGroq(groq_api_key=os.getenv("GROQ_API_KEY", "bench"), model_name=bench_model)
+    print(f"🧪 {bench_sessions} sessions x {bench_turns} turns")
+    print(f"{'path':<18} {'µs/turn':>9} {'peak MB':>9}")
+    for name, turn in (("LangChain", langchain_turn), ("direct", direct_turn)):
+        per_turn_ms, peak_mb = run(turn, llm)
+        print(f"{name:<18} {per_turn_ms * 1000:9.0f} {peak_mb:9.1f}")
+    if bench_live:
+        asyncio.run(live(llm))
@@ -1,52 +1,492 @@
-import chromadb
+import asyncio
+import os
+import time
+import numpy as np
+from collections import OrderedDict
+from functools import lru_cache
 from chromadb.utils import embedding_functions
-
-chroma_client = chromadb.HttpClient(host='localhost', port=8000)
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional
+from vector_index import NumpyVectorIndex, QuantizedNumpyVectorIndex, ChromaVectorIndex, INDEX_DIR, matches_where, normalize_rows
+from embedding_service import EmbeddingBatcher
+from arabic_text import normalize_arabic, strip_diacritics
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from title_index import TitleIndex
+from ingredient_index import IngredientIndex
+from recipe_clusters import RecipeClusters
+from recipe_store import RecipeStore
+from index_snapshots import IndexSnapshots
+from retrieval_cache import RetrievalCache, CachedCandidates
 
 model_name = "akhooli/Arabic-SBERT-100K"
 sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
 
-def retrieve_data(query, include_scores=False):
-    try:
-        collection = chroma_client.get_collection("recipestest", embedding_function=sentence_transformer_ef)
-    except chromadb.errors.InvalidCollectionException:
-        return []
+# Shared by every session on this worker: concurrent queries are encoded together off the event loop
+embedding_service = EmbeddingBatcher(sentence_transformer_ef)
 
-    include_fields = ["documents", "metadatas"]
-    if include_scores:
-        include_fields.append("distances")
+KB_DISTANCE_THRESHOLD = 0.35
+CANDIDATE_POOL_SIZE = 20  # hits taken from each retriever before fusion
+TITLE_MATCH_CONFIDENCE = 0.8  # title-index confidence needed to skip embedding + vector search
+TITLE_SUGGESTION_FLOOR = 0.6  # weaker title matches are not offered as suggestions
+CLUSTER_MATCH_FLOOR = 0.3  # cosine similarity a vague request needs to its nearest cluster centroid
+# Personalization: score += weight * (candidate · preference vector)
+PREFERENCE_WEIGHT = 0.005  # RRF-score units: reorders near-ties toward the user's taste, never buries the best match
+CLUSTER_PREFERENCE_WEIGHT = 0.1  # cosine units: vague requests lean harder on the profile
+TITLE_PREFERENCE_WEIGHT = 0.02  # title-score units: reorders equally good title matches, an exact title stays first
 
-    results = collection.query(
-        query_texts=[query],
-        n_results=7,
-        include=include_fields
-    )
+# "numpy" = in-process mmap'd index (default), "chroma" = Chroma server on localhost:8000
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "numpy")
+CHROMA_COLLECTION = "recipestest"  # each published version serves its own "recipestest_<version>" collection
+# "int8" = scan the quantized codes and rescore exactly (needs an index built with the same setting)
+VECTOR_QUANTIZATION = os.getenv("VECTOR_QUANTIZATION", "none")
 
-    structured_results = []
-    for i, (doc, metadata) in enumerate(zip(results["documents"][0], results["metadatas"][0])):
-        entry = {
-            "title": metadata.get("title", "وصفة بدون عنوان"),
-            "document": doc,
+_backend = None
+_lexical_index = None
+_title_index = None
+_ingredient_index = None
+_clusters = None
+
+# Ingest publishes versioned snapshots (index_snapshots.py); this worker serves `_index_version`
+# and swaps to a newly published one at the start of a query, checked at most every few seconds.
+snapshots = IndexSnapshots(INDEX_DIR)
+INDEX_VERSION_CHECK_SECONDS = 2.0
+_index_version = snapshots.current()
+_index_dir = snapshots.current_dir()
+_index_checked_at = time.monotonic()
+
+# Titles and full texts, fetched by id only for the hits that are returned
+recipe_store = RecipeStore(_index_dir)
+
+
+def refresh_index() -> bool:
+    """
+    Hot-swaps to the live index version if ingest published (or rolled back to) another one:
+    the recipe store and every lazily loaded index are dropped and reload from the new
+    version on first use. Queries already running keep the objects they hold, so nobody waits.
+    Returns True when a swap happened.
+    """
+    global _backend, _lexical_index, _title_index, _ingredient_index, _clusters
+    global _index_version, _index_dir, _index_checked_at, recipe_store
+    now = time.monotonic()
+    if now - _index_checked_at < INDEX_VERSION_CHECK_SECONDS:
+        return False
+    _index_checked_at = now
+
+    version = snapshots.current()
+    if version == _index_version:
+        return False
+    previous = _index_version
+    _index_version, _index_dir = version, snapshots.current_dir()
+    recipe_store = RecipeStore(_index_dir)
+    _backend = _lexical_index = _title_index = _ingredient_index = _clusters = None
+    get_recipe_text.cache_clear()
+    retrieval_cache.clear(version)
+    print(f"🔄 Switched from index version {previous or 'unversioned'} to {version}")
+    return True
+
+
+def get_backend():
+    """Returns the process-wide retrieval backend, created on first use."""
+    global _backend
+    if _backend is None:
+        if RETRIEVAL_BACKEND == "numpy" and VECTOR_QUANTIZATION == "int8" and QuantizedNumpyVectorIndex.exists(_index_dir):
+            _backend = QuantizedNumpyVectorIndex(_index_dir)
+            print(f"📦 Loaded in-process int8 vector index: {len(_backend)} recipes")
+        elif RETRIEVAL_BACKEND == "numpy" and NumpyVectorIndex.exists(_index_dir):
+            _backend = NumpyVectorIndex(_index_dir)
+            if VECTOR_QUANTIZATION == "int8":
+                print(f"⚠️ No int8 codes at '{_index_dir}'; rebuild with VECTOR_QUANTIZATION=int8. Using float32.")
+            print(f"📦 Loaded in-process vector index: {len(_backend)} recipes")
+        else:
+            if RETRIEVAL_BACKEND == "numpy":
+                print(f"⚠️ No vector index found at '{_index_dir}'. Falling back to Chroma server.")
+            _backend = ChromaVectorIndex(snapshots.chroma_collection(_index_version, CHROMA_COLLECTION),
+                                         embedding_function=sentence_transformer_ef)
+    return _backend
+
+
+def get_lexical_index() -> BM25Index:
+    """BM25 index over the stored titles and bodies, built once per process (227 docs take milliseconds)."""
+    global _lexical_index
+    if _lexical_index is None:
+        _lexical_index = BM25Index(recipe_store.iter_records())
+        print(f"📚 Built BM25 index over {len(_lexical_index)} recipes")
+    return _lexical_index
+
+
+def get_title_index() -> TitleIndex:
+    """Title index written by ingestion; rebuilt from the recipe store if the file is missing."""
+    global _title_index
+    if _title_index is None:
+        if TitleIndex.exists(_index_dir):
+            _title_index = TitleIndex.load(_index_dir)
+        else:
+            _title_index = TitleIndex.build(recipe_store.iter_records(), aliases=recipe_store.alias_titles())
+        print(f"🏷️ Title index ready: {len(_title_index)} titles")
+    return _title_index
+
+
+def get_ingredient_index() -> IngredientIndex:
+    """Ingredient -> recipe ids postings parsed at ingest, loaded from the recipe store once per process."""
+    global _ingredient_index
+    if _ingredient_index is None:
+        _ingredient_index = IngredientIndex.from_pairs(recipe_store.ingredient_pairs())
+        print(f"🥕 Ingredient index ready: {len(_ingredient_index)} ingredients")
+    return _ingredient_index
+
+
+def get_clusters() -> Optional[RecipeClusters]:
+    """Labelled recipe clusters written by ingestion, or None if the index has none yet."""
+    global _clusters
+    if _clusters is None and RecipeClusters.exists(_index_dir):
+        _clusters = RecipeClusters.load(_index_dir)
+        print(f"🧩 Loaded {len(_clusters)} recipe clusters")
+    return _clusters
+
+
+# --- Query embedding cache ---
+# Keys are normalized so "شوربة عدس", "شُوربَة عدس" and "شوربه عدس" share one embedding.
+normalize_query_key = normalize_arabic
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache with a TTL for query embeddings, keyed on normalized Arabic text."""
+
+    def __init__(self, max_size: int = 1024, ttl_seconds: float = 6 * 3600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (expires_at, embedding)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, text: str):
+        key = normalize_query_key(text)
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, text: str, embedding):
+        key = normalize_query_key(text)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, embedding)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
         }
-        if include_scores:
-            entry["distance"] = results["distances"][0][i]
-        structured_results.append(entry)
 
-    return structured_results
 
-def is_recipe_in_kb(query_result: str, threshold: float = 0.35) -> bool:
+query_embedding_cache = QueryEmbeddingCache(
+    max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("QUERY_CACHE_TTL", str(6 * 3600)))
+)
+
+# Shared by every session: popular dishes skip the vector search, BM25 and fusion entirely
+retrieval_cache = RetrievalCache(
+    max_size=int(os.getenv("RETRIEVAL_CACHE_SIZE", "512")),
+    ttl_seconds=float(os.getenv("RETRIEVAL_CACHE_TTL", "3600")),
+    similarity=float(os.getenv("RETRIEVAL_CACHE_SIMILARITY", "0.93")),
+)
+retrieval_cache.clear(_index_version)
+
+
+# Queries are embedded in the same form as the recipes were at ingest (strip_diacritics).
+def embed_query(query: str):
+    embedding = query_embedding_cache.get(query)
+    if embedding is None:
+        embedding = sentence_transformer_ef([strip_diacritics(query)])[0]
+        query_embedding_cache.put(query, embedding)
+    return embedding
+
+
+async def aembed_query(query: str):
+    embedding = query_embedding_cache.get(query)
+    if embedding is None:
+        embedding = await embedding_service.embed(strip_diacritics(query))
+        query_embedding_cache.put(query, embedding)
+    return embedding
+
+
+@dataclass
+class RetrievalResult:
     """
-    Returns True if query_result matches a known recipe in the KB based on embedding similarity.
+    Everything one recipe turn needs from the KB: the ranked hits (ids, titles, distances)
+    and the KB gate decision, produced by a single embedding + query round trip.
+    Recipe bodies are not included; fetch the chosen one with get_recipe_text().
+    """
+    query: str
+    hits: List[Dict[str, Any]] = field(default_factory=list)
+    in_kb: bool = False
+
+    title_match: bool = False  # an exact dish-name hit from the lexical index
+    excluded: int = 0  # candidates dropped because they contain one of the user's allergens
+    cluster_label: Optional[str] = None  # set when the hits are a cluster's suggestions for a vague request
+
+    @property
+    def top_distance(self) -> float:
+        distances = [hit["distance"] for hit in self.hits if hit.get("distance") is not None]
+        if not distances:
+            return 1.0  # fallback to 1.0 = far
+        return min(distances)
+
+    def title_ids(self) -> Dict[str, str]:
+        """Suggestion title -> recipe id (first, i.e. best-ranked, id wins for duplicate titles)."""
+        ids = {}
+        for hit in self.hits:
+            ids.setdefault(hit["title"], hit["id"])
+        return ids
+
+    def disliked(self) -> Dict[str, List[str]]:
+        """Suggestion title -> the user's disliked ingredients it contains."""
+        return {hit["title"]: hit["dislikes"] for hit in self.hits if hit.get("dislikes")}
+
+    def unique_titles(self) -> List[str]:
+        titles, seen = [], set()
+        for hit in self.hits:
+            if hit["title"] not in seen:
+                seen.add(hit["title"])
+                titles.append(hit["title"])
+        return titles
+
+
+def hydrate_titles(hits: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Fills in "title" from the recipe store; hits whose id is no longer stored are dropped."""
+    titles = recipe_store.get_titles([hit["id"] for hit in hits])
+    return [dict(hit, title=titles[hit["id"]]) for hit in hits if hit["id"] in titles]
+
+
+@lru_cache(maxsize=128)
+def get_recipe_text(recipe_id: str) -> Optional[str]:
+    """
+    Full diacritized recipe, loaded only once the user picks a suggestion.
+    Ids are content hashes, so a cached text can never go stale; the cache is shared by all sessions.
+    """
+    return recipe_store.get_text(recipe_id)
+
+
+def filter_for_user(hits: List[Dict[str, Any]], allergies: List[str] = None, dislikes: List[str] = None,
+                    limit: Optional[int] = None):
+    """Drops hits containing an allergen, cuts to `limit` and demotes/flags the ones with a disliked ingredient."""
+    if not allergies and not dislikes:
+        return hits[:limit], 0
+    metadata = recipe_store.get_metadata([hit["id"] for hit in hits]) if allergies else None
+    return get_ingredient_index().filter_hits(hits, allergies, dislikes, metadata, limit)
+
+
+async def abuild_preference_vector(likes: List[str], dislikes: List[str]) -> Optional[np.ndarray]:
+    """
+    One unit vector per user profile: mean embedding of the liked items (likes + favorite titles)
+    minus the mean of the disliked ones. Built once per session through the shared embedding service.
+    """
+    likes = [strip_diacritics(text) for text in likes if text and text.strip()]
+    dislikes = [strip_diacritics(text) for text in dislikes if text and text.strip()]
+    if not likes and not dislikes:
+        return None
+    vectors = normalize_rows(await embedding_service.embed_many(likes + dislikes))
+    liked, disliked = vectors[:len(likes)], vectors[len(likes):]
+    preference = (liked.mean(axis=0) if len(liked) else 0.0) - (disliked.mean(axis=0) if len(disliked) else 0.0)
+    norm = np.linalg.norm(preference)
+    return preference / norm if norm > 0 else None
+
+
+def rerank_by_preference(hits: List[Dict[str, Any]], scores: List[float], preference: Optional[np.ndarray],
+                         weight: float) -> List[Dict[str, Any]]:
+    """Re-orders hits by score + weight * (vector · preference); a few dot products on the candidate pool."""
+    if preference is None or not hits:
+        return hits
+    vectors = get_backend().get_vectors([hit["id"] for hit in hits])
+    blended = [
+        score + weight * float(vectors[hit["id"]] @ preference) if hit["id"] in vectors else score
+        for hit, score in zip(hits, scores)
+    ]
+    order = sorted(range(len(hits)), key=lambda i: -blended[i])
+    return [hits[i] for i in order]
+
+
+def filter_by_metadata(hits: List[Dict[str, Any]], where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """Applies a metadata filter to hits that did not come out of the filtered vector search (BM25, title index)."""
+    if not where or not hits:
+        return hits
+    metadata = recipe_store.get_metadata([hit["id"] for hit in hits])
+    return [hit for hit in hits if hit["id"] in metadata and matches_where(metadata[hit["id"]], where)]
+
+
+def match_title(query: str, n_results: int = 7, allergies: List[str] = None, dislikes: List[str] = None,
+                where: Dict[str, Any] = None, preference: Optional[np.ndarray] = None) -> Optional[RetrievalResult]:
+    """
+    Fast path for classifier outputs that are just a recipe title: answers from the
+    precomputed title index, without the embedding model or the vector search.
+    `preference` re-ranks the matches with their stored vectors (in-process index only;
+    a remote backend would need a network call here, so its title hits keep title order).
+    Returns None when no title matches with high confidence.
+    """
+    refresh_index()
+    matches, confidence = get_title_index().lookup(query, n_results=n_results)
+    if confidence < TITLE_MATCH_CONFIDENCE:
+        return None
+
+    matches = [match for match in matches if match["title_score"] >= TITLE_SUGGESTION_FLOOR]
+    hits = [{"id": match["id"], "title": match["title"]} for match in matches]
+    print(f"🏷️ Title index hit for '{query}': {hits[0]['title']} (confidence {confidence:.2f})")
+    if not get_backend().remote:
+        hits = rerank_by_preference(hits, [match["title_score"] for match in matches], preference,
+                                    TITLE_PREFERENCE_WEIGHT)
+    hits = filter_by_metadata(hits, where)
+    if not hits:
+        return None  # the named dish does not pass the filter; let the vector search find what does
+    hits, excluded = filter_for_user(hits, allergies, dislikes)
+    return RetrievalResult(query=query, hits=hits, in_kb=True, title_match=True, excluded=excluded)
+
+
+def retrieve_recipes(query: str, n_results: int = 7, threshold: float = KB_DISTANCE_THRESHOLD,
+                     allergies: List[str] = None, dislikes: List[str] = None,
+                     where: Dict[str, Any] = None, preference: Optional[np.ndarray] = None) -> RetrievalResult:
+    """
+    Embeds the query once, fuses the vector hits with BM25 hits and decides whether the
+    query is a known recipe: either the closest vector hit is within `threshold` or
+    the query is an exact dish-name match in the lexical index.
     Lower distance = more similar. Typical SBERT cosine distance thresholds: 0.2–0.3
+    Recipes containing one of `allergies` are dropped before the top `n_results` are cut,
+    ones containing a `dislikes` ingredient are flagged and ranked last among those n_results.
+    `where` is a metadata filter (e.g. {"category": "soup", "has_dairy": False}, see
+    recipe_metadata.py) applied inside the vector search itself. `preference`
+    (abuild_preference_vector) re-ranks the fused candidates toward the user's taste.
     """
-    results = retrieve_data(query_result, include_scores=True)
+    refresh_index()
+    cached = retrieval_cache.get(query, where)
+    if cached is None:
+        embedding = embed_query(query)
+        cached = retrieval_cache.get(query, where, embedding)
+        if cached is None:
+            version = _index_version
+            vector_hits = get_backend().query(embedding, n_results=CANDIDATE_POOL_SIZE, where=where)
+            cached = _fuse_candidates(query, vector_hits, where)
+            retrieval_cache.put(query, embedding, cached, where, version)
+    return _build_result(query, cached, n_results, threshold, allergies, dislikes, preference)
 
-    if not results:
-        return False
 
-    top_result = results[0]
-    top_distance = top_result.get("distance", 1)  # fallback to 1.0 = far
+async def aretrieve_recipes(query: str, n_results: int = 7, threshold: float = KB_DISTANCE_THRESHOLD,
+                            allergies: List[str] = None, dislikes: List[str] = None,
+                            where: Dict[str, Any] = None, preference: Optional[np.ndarray] = None) -> RetrievalResult:
+    """
+    Async retrieve_recipes() for the WebSocket path: the query embedding comes from the
+    cache or the shared micro-batching service, and remote backends are queried in a
+    thread, so the event loop never blocks on the model or the network.
+    """
+    refresh_index()
+    # Read together before any await: a hot swap meanwhile must not cache old candidates as new
+    version, backend = _index_version, get_backend()
+    cached = retrieval_cache.get(query, where)
+    if cached is None:
+        embedding = await aembed_query(query)
+        cached = retrieval_cache.get(query, where, embedding)
+        if cached is None:
+            if backend.remote:
+                vector_hits = await asyncio.to_thread(backend.query, embedding, CANDIDATE_POOL_SIZE, where)
+                cached = await asyncio.to_thread(_fuse_candidates, query, vector_hits, where)
+            else:
+                vector_hits = backend.query(embedding, n_results=CANDIDATE_POOL_SIZE, where=where)
+                cached = _fuse_candidates(query, vector_hits, where)
+            retrieval_cache.put(query, embedding, cached, where, version)
+    if backend.remote:
+        # Re-ranking fetches candidate vectors from the server too, so it also runs off the loop
+        return await asyncio.to_thread(_build_result, query, cached, n_results, threshold,
+                                       allergies, dislikes, preference)
+    return _build_result(query, cached, n_results, threshold, allergies, dislikes, preference)
+
+
+def _fuse_candidates(query: str, vector_hits: List[Dict[str, Any]], where: Dict[str, Any] = None) -> CachedCandidates:
+    """Fuses the vector hits with BM25 hits; the same for every user, so the outcome is cacheable."""
+    lexical_hits = filter_by_metadata(get_lexical_index().search(query, n_results=CANDIDATE_POOL_SIZE), where)
+    fused = reciprocal_rank_fusion([vector_hits, lexical_hits])
+    return CachedCandidates(
+        candidates=[hit for _, hit in fused],
+        scores=[score for score, _ in fused],
+        title_match=bool(lexical_hits) and lexical_hits[0]["title_match"],
+        best_distance=min((hit["distance"] for hit in vector_hits), default=1.0),
+    )
+
+
+def _build_result(query: str, fused: CachedCandidates, n_results: int, threshold: float,
+                  allergies: List[str] = None, dislikes: List[str] = None,
+                  preference: Optional[np.ndarray] = None) -> RetrievalResult:
+    """Applies one user's preferences, allergies and dislikes to the shared candidates."""
+    candidates = rerank_by_preference(fused.candidates, fused.scores, preference, PREFERENCE_WEIGHT)
+    candidates, excluded = filter_for_user(candidates, allergies, dislikes, limit=n_results)
+    hits = hydrate_titles(candidates)
+    result = RetrievalResult(query=query, hits=hits, title_match=fused.title_match, excluded=excluded)
+    # The KB gate looks at every candidate: a dish the user is allergic to is still "in the KB"
+    result.in_kb = bool(fused.candidates) and (fused.title_match or fused.best_distance <= threshold)
+
+    if hits:
+        print(f"🔎 Top title: {hits[0]['title']}, distance: {result.top_distance:.3f}, "
+              f"title match: {result.title_match}")
+
+    return result
+
+
+async def asuggest_from_cluster(query: str, n_results: int = 7, allergies: List[str] = None,
+                                dislikes: List[str] = None, preference: Optional[np.ndarray] = None) -> Optional[RetrievalResult]:
+    """
+    For "food generalized" requests ("أنا عايز شوربة"): maps the request to the nearest
+    precomputed recipe cluster and returns concrete suggestions from inside it, ranked by
+    similarity to the request. Returns None when no cluster is close enough.
+    """
+    refresh_index()
+    # Clusters and backend come from the same version, whatever is swapped in during the await
+    clusters, backend = get_clusters(), get_backend()
+    if clusters is None:
+        return None
+
+    embedding = await aembed_query(query)
+    cluster, similarity = clusters.nearest(embedding)
+    if cluster is None or similarity < CLUSTER_MATCH_FLOOR:
+        print(f"🧩 No cluster close enough to '{query}' (best {similarity:.3f})")
+        return None
+
+    where = {"cluster": cluster["id"]}
+    if backend.remote:
+        vector_hits = await asyncio.to_thread(backend.query, embedding, CANDIDATE_POOL_SIZE, where)
+    else:
+        vector_hits = backend.query(embedding, n_results=CANDIDATE_POOL_SIZE, where=where)
+
+    rerank_args = (vector_hits, [1.0 - hit["distance"] for hit in vector_hits], preference, CLUSTER_PREFERENCE_WEIGHT)
+    if backend.remote:
+        candidates = await asyncio.to_thread(rerank_by_preference, *rerank_args)
+    else:
+        candidates = rerank_by_preference(*rerank_args)
+    candidates, excluded = filter_for_user(candidates, allergies, dislikes, limit=n_results)
+    hits = hydrate_titles(candidates)
+    print(f"🧩 '{query}' -> cluster {cluster['id']} '{cluster['label']}' (similarity {similarity:.3f}), {len(hits)} suggestions")
+    return RetrievalResult(query=query, hits=hits, in_kb=bool(hits), excluded=excluded,
+                           cluster_label=cluster["label"])
+
+
+def retrieve_data(query, include_scores=False, where=None):
+    structured_results = []
+    for hit in retrieve_recipes(query, where=where).hits:
+        entry = {"title": hit["title"], "document": get_recipe_text(hit["id"])}
+        if include_scores:
+            entry["distance"] = hit.get("distance")  # None for lexical-only hits
+        structured_results.append(entry)
 
-    print(f"🔎 Top title: {top_result['title']}, distance: {top_distance:.3f}")
+    return structured_results
 
-    return top_distance <= threshold
+def is_recipe_in_kb(query_result: str, threshold: float = KB_DISTANCE_THRESHOLD) -> bool:
+    """
+    Returns True if query_result matches a known recipe in the KB based on embedding similarity.
+    Prefer retrieve_recipes() when the hits are needed too, it answers both in one query.
+    """
+    return retrieve_recipes(query_result, threshold=threshold).in_kb
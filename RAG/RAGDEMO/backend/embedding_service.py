@@ -0,0 +1,87 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+
+class EmbeddingBatcher:
+    """
+    Runs the sentence-transformer off the event loop with dynamic micro-batching.
+
+    Callers await embed(text). Texts arriving within `max_wait_ms` of each other (or while
+    the previous batch is still encoding) are encoded together in one forward pass on a
+    dedicated worker thread, then each caller's future is resolved with its own vector.
+    Torch releases the GIL during encoding, so WebSockets keep being served meanwhile.
+    """
+
+    def __init__(self, embedding_function, max_batch_size: int = 32, max_wait_ms: float = 5.0):
+        self.embedding_function = embedding_function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedder")
+        self._loop = None
+        self._queue = None
+        self._worker = None
+        self.batches = 0
+        self.texts = 0
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def embed(self, text: str):
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future))
+        return await future
+
+    async def embed_many(self, texts: List[str]):
+        return await asyncio.gather(*(self.embed(text) for text in texts))
+
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Anything that queued up while the previous batch was encoding is taken right away
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return [(text, future) for text, future in batch if not future.cancelled()]
+
+    async def _run(self):
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = await self._loop.run_in_executor(self._executor, self.embedding_function, texts)
+            except Exception as e:
+                print(f"🔥 Embedding batch of {len(texts)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.texts += len(texts)
+            for (_, future), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def shutdown(self):
+        if self._worker is not None:
+            self._worker.cancel()
+        self._executor.shutdown(wait=False)
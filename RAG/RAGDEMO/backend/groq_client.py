@@ -0,0 +1,61 @@
+import os
+import httpx
+from groq import AsyncGroq, Groq
+
+# Timeouts (seconds) and connection pool for every Groq call made by this process
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "30"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "2"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "100"))
+GROQ_MAX_KEEPALIVE = int(os.getenv("GROQ_MAX_KEEPALIVE", "20"))
+GROQ_KEEPALIVE_EXPIRY = 60.0
+
+_async_client = None
+_sync_client = None
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=GROQ_MAX_CONNECTIONS, max_keepalive_connections=GROQ_MAX_KEEPALIVE,
+                        keepalive_expiry=GROQ_KEEPALIVE_EXPIRY)
+
+
+def get_async_groq() -> AsyncGroq:
+    """
+    Process-wide AsyncGroq client, created on first use. Its pooled httpx client keeps TLS
+    connections to the API alive between calls, and awaiting it never blocks the event loop,
+    so one slow classification only delays its own session.
+    """
+    global _async_client
+    if _async_client is None:
+        _async_client = AsyncGroq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            max_retries=GROQ_MAX_RETRIES,
+            timeout=_timeout(),
+            http_client=httpx.AsyncClient(timeout=_timeout(), limits=_limits()),
+        )
+    return _async_client
+
+
+def get_groq() -> Groq:
+    """Pooled synchronous client for scripts and offline evaluation (scores.py); the server uses get_async_groq()."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = Groq(
+            api_key=os.getenv("GROQ_API_KEY"),
+            max_retries=GROQ_MAX_RETRIES,
+            timeout=_timeout(),
+            http_client=httpx.Client(timeout=_timeout(), limits=_limits()),
+        )
+    return _sync_client
+
+
+async def aclose_groq():
+    """Closes the pooled connections on application shutdown."""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from vector_index import INDEX_DIR, NumpyVectorIndex, QuantizedNumpyVectorIndex
+from recipe_store import RecipeStore, RECIPE_STORE_FILE
+from title_index import TitleIndex
+from recipe_clusters import RecipeClusters
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+SNAPSHOT_FILE = "snapshot.json"  # written when a version is published; unpublished dirs are failed builds
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", "3"))  # prior versions kept for rollback
+MAX_SHRINK = 0.5  # a new version with less than half the recipes of the live one is refused
+SMOKE_QUERIES = ["شوربة عدس", "مكرونة بالبشاميل", "فراخ مشوية", "سلطة خضرا", "محشي ورق عنب"]
+SELF_CHECK_SAMPLE = 20  # stored vectors re-queried to check each finds itself first
+
+# Every index file except the SQLite store is replaced via a temp file + os.replace, never
+# edited in place, so a new version can hard-link them instead of copying.
+_COPIED_FILES = (RECIPE_STORE_FILE,)
+
+
+def chroma_collection_name(base: str, version: str) -> str:
+    """Each version gets its own Chroma collection, so ingest never writes into the one being served."""
+    return f"{base}_{version}"
+
+
+def _link_or_copy(src: str, dst: str):
+    if os.path.basename(src) in _COPIED_FILES:
+        shutil.copy2(src, dst)
+        return
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class IndexSnapshots:
+    """
+    Versioned index directories under `root`: root/versions/<version>/ holds one complete
+    index (vectors, recipe store, title index, clusters, ...) and root/CURRENT names the
+    live one. Ingest builds and validates a new version next to the live one and publishes
+    it by os.replace-ing CURRENT, so readers switch from one complete index to the next and
+    never wait for the writer. An index written before snapshots (files directly in root)
+    is read as the live version until the first publish.
+    """
+
+    def __init__(self, root: str = INDEX_DIR):
+        self.root = root
+        self.versions_dir = os.path.join(root, VERSIONS_DIR)
+
+    def current(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.versions_dir, version)
+
+    def current_dir(self) -> str:
+        version = self.current()
+        return self.version_dir(version) if version else self.root
+
+    def versions(self) -> List[str]:
+        """Published versions, oldest first (names sort chronologically)."""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        return sorted(name for name in os.listdir(self.versions_dir)
+                      if os.path.exists(os.path.join(self.versions_dir, name, SNAPSHOT_FILE)))
+
+    def info(self, version: str) -> dict:
+        with open(os.path.join(self.version_dir(version), SNAPSHOT_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def chroma_collection(self, version: Optional[str], base: str) -> str:
+        """The Chroma collection published with `version`; `base` for unversioned or pre-snapshot indexes."""
+        if version is None:
+            return base
+        try:
+            return self.info(version).get("chroma_collection", base)
+        except FileNotFoundError:
+            return base
+
+    def stage(self) -> Tuple[str, str]:
+        """
+        Creates the directory of the next version, seeded with the live index so ingest stays
+        incremental. Returns (version, directory); nothing is visible to readers until publish().
+        """
+        version = time.strftime("%Y%m%d-%H%M%S")
+        suffix = 1
+        while os.path.exists(self.version_dir(version)):
+            version = f"{time.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+            suffix += 1
+
+        source, staging = self.current_dir(), self.version_dir(version)
+        if os.path.isdir(source):
+            shutil.copytree(source, staging, copy_function=_link_or_copy,
+                            ignore=shutil.ignore_patterns(VERSIONS_DIR, CURRENT_FILE, SNAPSHOT_FILE, "*.tmp"))
+        else:
+            os.makedirs(staging)
+        return version, staging
+
+    def publish(self, version: str, **info) -> List[str]:
+        """Marks `version` as complete, points CURRENT at it atomically and prunes old versions (returned)."""
+        with open(os.path.join(self.version_dir(version), SNAPSHOT_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": version, "published": time.strftime("%Y-%m-%d %H:%M:%S"), **info}, f, indent=1)
+        self._point_to(version)
+        return self.prune()
+
+    def rollback(self, version: str = None) -> str:
+        """Points CURRENT at `version`, or at the newest version older than the live one."""
+        versions, current = self.versions(), self.current()
+        if version is None:
+            older = [name for name in versions if current is None or name < current]
+            if not older:
+                raise ValueError("No earlier index version to roll back to")
+            version = older[-1]
+        elif version not in versions:
+            raise ValueError(f"Unknown index version '{version}'; available: {', '.join(versions) or 'none'}")
+        self._point_to(version)
+        return version
+
+    def discard(self, version: str):
+        shutil.rmtree(self.version_dir(version), ignore_errors=True)
+
+    def prune(self, keep: int = KEEP_VERSIONS) -> List[str]:
+        """Deletes unpublished dirs and all but the `keep` newest versions besides the live one; returns their names."""
+        current, published = self.current(), self.versions()
+        older = [name for name in published if name != current]
+        kept = {current, *(older[-keep:] if keep else [])}
+        removed = [name for name in os.listdir(self.versions_dir) if name not in kept]
+        for name in removed:
+            self.discard(name)
+        return removed
+
+    def _point_to(self, version: str):
+        path = os.path.join(self.root, CURRENT_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(path + ".tmp", path)
+
+
+def validate_snapshot(index_dir: str, expected_ids: List[str], encode: Callable[[List[str]], np.ndarray] = None,
+                      live_count: int = 0) -> List[str]:
+    """
+    Checks a built version before it goes live: every artifact loads, the vector index, recipe
+    store and title index agree on the expected ids, sampled stored vectors find themselves
+    first, and the smoke queries (when `encode` is given) return hydratable hits.
+    Returns the problems found; an empty list means the version can be published.
+    """
+    problems = []
+    expected = set(expected_ids)
+    if live_count and len(expected) < (1 - MAX_SHRINK) * live_count:
+        problems.append(f"corpus shrank from {live_count} to {len(expected)} recipes")
+
+    try:
+        indexes = [NumpyVectorIndex(index_dir)]
+        if QuantizedNumpyVectorIndex.exists(index_dir):
+            indexes.append(QuantizedNumpyVectorIndex(index_dir))
+        store = RecipeStore(index_dir)
+        titles = TitleIndex.load(index_dir)
+    except (OSError, ValueError) as e:
+        return problems + [f"index does not load: {e}"]
+
+    index = indexes[0]
+    if set(index.ids) != expected or len(index) != len(expected):
+        problems.append(f"vector index has {len(index)} ids, expected {len(expected)}")
+    stored = set(store.canonical_ids())
+    if stored != expected:
+        problems.append(f"recipe store has {len(stored)} indexable recipes, expected {len(expected)}")
+    titled = {entry["id"] for entry in titles.entries}
+    if titled != expected:
+        problems.append(f"title index covers {len(titled)} recipes, expected {len(expected)}")
+    if not NumpyVectorIndex.has_metadata(index_dir) or not RecipeClusters.exists(index_dir):
+        problems.append("metadata bitmask or recipe clusters missing")
+    if problems or not len(expected):
+        return problems
+
+    sample = index.ids[::max(1, len(index) // SELF_CHECK_SAMPLE)][:SELF_CHECK_SAMPLE]
+    vectors = index.get_vectors(sample)
+    for candidate in indexes:
+        for id_ in sample:
+            best = candidate.query(vectors[id_], n_results=1)
+            if not best or (best[0]["id"] != id_ and best[0]["distance"] > 1e-4):
+                problems.append(f"{type(candidate).__name__}: recipe {id_} does not retrieve itself")
+                break
+
+    if encode is not None:
+        for query, embedding in zip(SMOKE_QUERIES, encode(SMOKE_QUERIES)):
+            hits = index.query(embedding, n_results=3)
+            if len(hits) != min(3, len(index)) or len(store.get_titles([hit["id"] for hit in hits])) != len(hits):
+                problems.append(f"smoke query '{query}' returned {len(hits)} hits, not all of them stored")
+    return problems
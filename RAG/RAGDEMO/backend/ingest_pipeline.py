@@ -0,0 +1,133 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import Callable, Dict, Any, Iterable, Iterator, List
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_QUEUE_SIZE = 4  # encoded batches allowed in flight between the encoders and the writer
+
+# --- Encoder process state (one model per worker process, loaded by the pool initializer) ---
+_worker_ef = None
+
+
+def _init_encoder(model_name: str):
+    global _worker_ef
+    from chromadb.utils import embedding_functions
+    _worker_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=model_name)
+
+
+def _encode_batch(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_ef(texts), dtype=np.float32)
+
+
+def batched(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class IngestPipeline:
+    """
+    Streaming ingestion: records -> normalize -> batched encoding in a process pool -> batched writes.
+
+    Records come from any iterator (e.g. a file-reader generator), so the corpus never has
+    to fit in memory at once. A bounded queue between the encoders and the writer thread
+    applies back-pressure: the reader stops pulling files when `queue_size` batches are
+    waiting. A run of a single batch (a handful of changed files) is encoded in-process,
+    since starting `encode_workers` processes that each load the model costs far more;
+    the in-process model is then reused by encode(). `encode_workers=0` always encodes in-process.
+    """
+
+    def __init__(self, model_name: str, normalize: Callable[[str], str] = lambda t: t,
+                 batch_size: int = DEFAULT_BATCH_SIZE, encode_workers: int = None,
+                 queue_size: int = DEFAULT_QUEUE_SIZE, progress_every: int = 500):
+        self.model_name = model_name
+        self.normalize = normalize
+        self.batch_size = batch_size
+        self.encode_workers = encode_workers if encode_workers is not None else int(
+            os.getenv("INGEST_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+        self.queue_size = queue_size
+        self.progress_every = progress_every
+        self._local_ef = None
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes a few texts in this process (e.g. tag prototypes); reuses the model run() loaded in-process."""
+        if self._local_ef is None:
+            from chromadb.utils import embedding_functions
+            self._local_ef = embedding_functions.SentenceTransformerEmbeddingFunction(model_name=self.model_name)
+        return np.asarray(self._local_ef(texts), dtype=np.float32)
+
+    def run(self, records: Iterable[Dict[str, Any]], sink: Callable[[List[Dict[str, Any]], np.ndarray], None]) -> Dict[str, Any]:
+        """
+        Feeds every record (dicts with "id" and "full_text") through the pipeline and calls
+        sink(batch_records, batch_embeddings) in input order. Returns throughput stats.
+        """
+        started = time.perf_counter()
+        pending = queue.Queue(maxsize=self.queue_size)
+        stats = {"docs": 0, "batches": 0}
+        errors = []
+
+        def writer():
+            next_report = self.progress_every
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                batch, future = item
+                try:
+                    sink(batch, future.result())
+                except Exception as e:
+                    errors.append(e)
+                    continue
+                stats["docs"] += len(batch)
+                stats["batches"] += 1
+                if stats["docs"] >= next_report:
+                    elapsed = time.perf_counter() - started
+                    print(f"⏳ {stats['docs']} recipes ingested ({stats['docs'] / elapsed:.1f} docs/sec)")
+                    next_report += self.progress_every
+
+        writer_thread = threading.Thread(target=writer, name="ingest-writer", daemon=True)
+        writer_thread.start()
+
+        executor = None
+        batches = batched(records, self.batch_size)
+        lookahead = list(itertools.islice(batches, 2))
+        use_pool = self.encode_workers > 0 and len(lookahead) > 1
+        try:
+            for batch in itertools.chain(lookahead, batches):
+                if errors:
+                    break
+                texts = [self.normalize(record["full_text"]) for record in batch]
+
+                if use_pool:
+                    if executor is None:
+                        executor = ProcessPoolExecutor(max_workers=self.encode_workers, initializer=_init_encoder,
+                                                       initargs=(self.model_name,))
+                    future = executor.submit(_encode_batch, texts)
+                else:
+                    future = Future()
+                    future.set_result(self.encode(texts))
+
+                pending.put((batch, future))  # blocks while the writer is `queue_size` batches behind
+        finally:
+            pending.put(None)
+            writer_thread.join()
+            if executor is not None:
+                executor.shutdown()
+
+        if errors:
+            raise errors[0]
+
+        stats["seconds"] = time.perf_counter() - started
+        stats["docs_per_sec"] = stats["docs"] / stats["seconds"] if stats["seconds"] > 0 else 0.0
+        return stats
@@ -0,0 +1,170 @@
+from collections import defaultdict
+from typing import List, Dict, Any, Iterable, Optional, Set, Tuple
+from arabic_text import normalize_arabic
+from lexical_index import tokenize
+
+INGREDIENTS_HEADER = "المكونات"
+INGREDIENT_PARSER_VERSION = 3  # bump when tokens or recipe_metadata rules change; ingest then re-derives every stored recipe
+# Lines that open the method section ("الطريقة:", "طريقة التحضير", "تحضير الفراخ:") end the ingredients
+_METHOD_PREFIXES = ("الطريقه", "طريقه", "تحضير")
+
+# Quantities, units and preparation words: never what an allergy or a dislike refers to
+INGREDIENT_STOPWORDS = {
+    "نص", "ربع", "تلت", "تلات", "ثلاث", "اربع", "خمس", "ست", "سبع", "تمن", "تسع", "عشر", "اتن", "واحد",
+    "ملعق", "ملاعق", "كوب", "اكواب", "كباي", "كيلو", "جرام", "علب", "كيس", "فص", "فصوص", "حب", "حبات",
+    "رشه", "شوي", "صغير", "كبير", "متوسط", "مفروم", "مقطع", "مطحون", "مبشور", "مسلوق", "مهروس", "مقشر", "حسب", "رغب",
+    "اختياري", "غير", "او", "و", "ل", "مكعب", "شرايح", "ناعم", "خشن", "حاجه",
+}
+_SUFFIXES = ("تين", "ات", "ين", "ه")
+# Words whose final "ه" is not a feminine ending on the same ingredient: dropping it would
+# turn beef shank into banana, nutmeg into walnut, a minute into flour and tahini into flour.
+_UNSTEMMED = {"موزه", "جوزه", "دقيقه", "طحينه"}
+# Spelling variants (stemmed) -> the spelling the recipes use: the corpus writes Egyptian "توم",
+# never "ثوم", so a "ثوم" dislike would otherwise match nothing
+SPELLING_VARIANTS = {
+    "ثوم": "توم", "باذنجان": "بتنجان", "بدنجان": "بتنجان", "كسبر": "كزبر", "قوط": "طماطم",
+    "جنزبيل": "زنجبيل", "ينسون": "يانسون", "كراويا": "كراوي",
+}
+
+# Allergy categories offered at signup (Signup.js) -> the recipe_metadata.ALLERGEN_RULES flag
+# that covers the whole family ("قمح" blocks bread, pasta, flour, freekeh, ...)
+ALLERGY_FLAGS = {
+    "قمح": "has_gluten", "جلوتين": "has_gluten",
+    "لبن": "has_dairy", "حليب": "has_dairy", "ألبان": "has_dairy",
+    "بيض": "has_egg",
+    "مكسرات": "has_nuts",
+    "سمسم": "has_sesame",
+}
+# Allergies naming a family of ingredients that no flag matches exactly
+ALLERGY_FAMILIES = {
+    "سمك": ["سمك", "سلمون", "تونة", "رنجة", "بلطي", "بوري", "فسيخ", "سردين", "ماكريل", "قاروص", "دنيس", "أنشوجة"],
+}
+
+
+def ingredient_stem(token: str) -> str:
+    """
+    Folds the "و" conjunction and plural/dual/feminine endings so "وبيضتين", "بيضه" and "بيض"
+    share one key, and spelling variants ("ثوم", "توم") onto the corpus spelling.
+    """
+    if token.startswith("و") and len(token) >= 4:
+        token = token[1:]
+    if token in _UNSTEMMED:
+        return token
+    for suffix in _SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            token = token[:-len(suffix)]
+            break
+    return SPELLING_VARIANTS.get(token, token)
+
+
+def phrase_tokens(phrase: str) -> Set[str]:
+    """Stemmed tokens of an ingredient line or of a user phrase such as "فول سوداني"."""
+    return {
+        stem for stem in (ingredient_stem(token) for token in tokenize(phrase))
+        if stem not in INGREDIENT_STOPWORDS
+    }
+
+
+_FLAG_KEYS = {frozenset(phrase_tokens(phrase)): flag for phrase, flag in ALLERGY_FLAGS.items()}
+_FAMILY_KEYS = {frozenset(phrase_tokens(phrase)): members for phrase, members in ALLERGY_FAMILIES.items()}
+
+
+def allergy_flag(phrase: str) -> Optional[str]:
+    """The has_* metadata flag an allergy category stands for, or None for a single ingredient."""
+    return _FLAG_KEYS.get(frozenset(phrase_tokens(phrase)))
+
+
+def parse_ingredient_lines(text: str) -> List[str]:
+    """Lines between the "المكونات" header and the first method header; sub-headers ("للحشوة:") are skipped."""
+    lines, inside = [], False
+    for raw_line in text.splitlines():
+        line = normalize_arabic(raw_line).strip(" :")
+        if not line:
+            continue
+        if not inside:
+            inside = line.startswith(INGREDIENTS_HEADER)
+            continue
+        if line.startswith(_METHOD_PREFIXES):
+            break
+        if raw_line.strip().endswith(":"):
+            continue
+        lines.append(line)
+    return lines
+
+
+def ingredient_tokens(text: str) -> List[str]:
+    tokens = set()
+    for line in parse_ingredient_lines(text):
+        tokens |= phrase_tokens(line)
+    return sorted(tokens)
+
+
+class IngredientIndex:
+    """
+    Inverted index ingredient token -> recipe ids, parsed once at ingest and kept in the
+    recipe store. A user phrase conflicts with a recipe when all of its tokens are among
+    the recipe's ingredient tokens, so allergy/dislike checks are set intersections.
+    """
+
+    def __init__(self, postings: Dict[str, Set[str]]):
+        self.postings = postings
+
+    @classmethod
+    def from_pairs(cls, pairs: Iterable[Tuple[str, str]]) -> "IngredientIndex":
+        postings = defaultdict(set)
+        for token, recipe_id in pairs:
+            postings[token].add(recipe_id)
+        return cls(dict(postings))
+
+    def __len__(self):
+        return len(self.postings)
+
+    def _recipes_with_tokens(self, tokens: Set[str]) -> Set[str]:
+        if not tokens:
+            return set()
+        return set.intersection(*(self.postings.get(token, set()) for token in tokens))
+
+    def recipes_with(self, phrase: str) -> Set[str]:
+        """Recipes containing the phrase, or any member of the ingredient family it names ("سمك" -> تونة، سلمون، ...)."""
+        tokens = frozenset(phrase_tokens(phrase))
+        found = self._recipes_with_tokens(tokens)
+        for member in _FAMILY_KEYS.get(tokens, []):
+            found |= self._recipes_with_tokens(phrase_tokens(member))
+        return found
+
+    def conflicts(self, phrases: Iterable[str], recipe_ids: Iterable[str],
+                  metadata: Dict[str, Dict[str, Any]] = None) -> Dict[str, List[str]]:
+        """
+        Recipe id -> the phrases it conflicts with, for the given candidate ids only. With the
+        candidates' `metadata`, a category phrase ("قمح", "مكسرات") also matches every recipe
+        carrying its has_* flag.
+        """
+        candidates = set(recipe_ids)
+        found = defaultdict(list)
+        for phrase in phrases or []:
+            matched = self.recipes_with(phrase) & candidates
+            flag = allergy_flag(phrase)
+            if flag and metadata:
+                matched |= {id_ for id_ in candidates if metadata.get(id_, {}).get(flag)}
+            for recipe_id in matched:
+                found[recipe_id].append(phrase)
+        return dict(found)
+
+    def filter_hits(self, hits: List[Dict[str, Any]], allergies: List[str] = None, dislikes: List[str] = None,
+                    metadata: Dict[str, Dict[str, Any]] = None, limit: Optional[int] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Drops hits containing an allergen, keeps the first `limit` of the rest and flags
+        ("dislikes") the ones containing a disliked ingredient; flagged hits move after the
+        unflagged ones of that slice only, so a dislike never swaps a relevant recipe for an
+        unrelated one. `metadata` (recipe id -> metadata) lets allergy categories block by
+        their has_* flag. Returns (hits, number of hits dropped).
+        """
+        blocked = self.conflicts(allergies, [hit["id"] for hit in hits], metadata)
+        kept = [hit for hit in hits if hit["id"] not in blocked]
+        dropped = len(hits) - len(kept)
+        kept = kept[:limit]
+
+        flagged = self.conflicts(dislikes, [hit["id"] for hit in kept])
+        preferred = [hit for hit in kept if hit["id"] not in flagged]
+        demoted = [dict(hit, dislikes=flagged[hit["id"]]) for hit in kept if hit["id"] in flagged]
+        return preferred + demoted, dropped
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+from arabic_text import strip_diacritics
+from vector_index import normalize_rows
+from chroma_utils import aembed_query, sentence_transformer_ef, refresh_index, get_title_index, TITLE_MATCH_CONFIDENCE
+
+# Labelled example queries (trained from the scores.py JSONL: query, context, intent)
+INTENT_EXAMPLES_FILE = os.getenv(
+    "INTENT_EXAMPLES_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "RAGdatabase", "intent_examples.npz"))
+INTENT_NEIGHBOURS = 7
+INTENT_CONFIDENCE = float(os.getenv("INTENT_LOCAL_CONFIDENCE", "0.8"))  # similarity-weighted vote share of the winner
+INTENT_MIN_SIMILARITY = float(os.getenv("INTENT_LOCAL_MIN_SIMILARITY", "0.7"))  # nearest example must be this close
+
+# The classifier's fixed outputs; any other intent in the dataset is a dish name
+FIXED_INTENTS = ["not food related", "respond based on chat history", "food generalized",
+                 "video search", "web search", "google calendar event"]
+DISH_INTENT = "dish"
+# The kNN only sees the message. Chat-history replies always go to the LLM; once there is a
+# conversation, only labels a message carries whatever preceded it are answered locally
+# (a whole-message recipe title, an explicit calendar request).
+LLM_ONLY_INTENTS = {"respond based on chat history"}
+CONTEXT_FREE_INTENTS = {DISH_INTENT, "google calendar event"}
+
+
+def intent_label(intent: str) -> str:
+    intent = intent.strip()
+    return intent if intent in FIXED_INTENTS else DISH_INTENT
+
+
+class KnnIntentClassifier:
+    """
+    Similarity-weighted kNN over SBERT embeddings of labelled queries. A prediction is
+    (label, confidence, nearest similarity), where confidence is the winning label's share
+    of the neighbours' similarity mass; callers fall back to the LLM below their thresholds.
+    """
+
+    def __init__(self, embeddings: np.ndarray, labels: List[str], k: int = INTENT_NEIGHBOURS):
+        self.embeddings = normalize_rows(embeddings)
+        self.labels = list(labels)
+        self.k = min(k, len(self.labels))
+
+    @classmethod
+    def load(cls, path: str = INTENT_EXAMPLES_FILE) -> Optional["KnnIntentClassifier"]:
+        if not os.path.exists(path):
+            return None
+        data = np.load(path)
+        return cls(data["embeddings"], data["labels"].tolist())
+
+    @staticmethod
+    def save(embeddings: np.ndarray, labels: List[str], path: str = INTENT_EXAMPLES_FILE):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, embeddings=normalize_rows(embeddings), labels=np.array(labels))
+        os.replace(tmp_path, path)
+
+    def _vote(self, similarities: np.ndarray) -> Tuple[str, float, float]:
+        nearest = np.argpartition(-similarities, self.k - 1)[:self.k]
+        weights = Counter()
+        for row in nearest:
+            weights[self.labels[row]] += max(float(similarities[row]), 0.0)
+        total = sum(weights.values())
+        label, weight = weights.most_common(1)[0]
+        return label, (weight / total if total else 0.0), float(similarities[nearest].max())
+
+    def predict(self, embedding) -> Tuple[str, float, float]:
+        return self._vote(self.embeddings @ normalize_rows(embedding)[0])
+
+    def leave_one_out(self) -> List[Tuple[str, str, float, float]]:
+        """(true label, predicted label, confidence, nearest similarity) for every example, predicted from the others."""
+        similarities = self.embeddings @ self.embeddings.T
+        np.fill_diagonal(similarities, -np.inf)
+        results = []
+        for row, label in enumerate(self.labels):
+            predicted, confidence, nearest = self._vote(similarities[row])
+            results.append((label, predicted, confidence, nearest))
+        return results
+
+
+_classifier = None
+_classifier_loaded = False
+
+
+def get_classifier() -> Optional[KnnIntentClassifier]:
+    global _classifier, _classifier_loaded
+    if not _classifier_loaded:
+        _classifier = KnnIntentClassifier.load()
+        _classifier_loaded = True
+        if _classifier is not None:
+            print(f"🧭 Loaded {len(_classifier.labels)} intent examples")
+    return _classifier
+
+
+async def aclassify_locally(query: str, chat_context: str = "",
+                            embedding: Optional[asyncio.Future] = None) -> Optional[str]:
+    """
+    Fast path in front of aclassify_query_groq: returns a classification only when the kNN
+    vote is confident, and None to defer to the LLM. A dish answer is returned only when the
+    whole message is a recipe title the title index knows (the message itself is then the
+    dish name); extracting a dish from a longer sentence is left to the LLM.
+    embedding is the caller's pending aembed_query(query), so the message is encoded once.
+    """
+    classifier = get_classifier()
+    if classifier is None:
+        return None
+    try:
+        vector = await asyncio.shield(embedding) if embedding is not None else await aembed_query(query)
+        label, confidence, nearest = classifier.predict(vector)
+    except Exception as e:
+        print(f"⚠️ Local intent classifier failed: {e}")
+        return None
+
+    if confidence < INTENT_CONFIDENCE or nearest < INTENT_MIN_SIMILARITY:
+        print(f"🧭 Local intent '{label}' not confident ({confidence:.2f}, nearest {nearest:.2f}); asking the LLM")
+        return None
+    if label in LLM_ONLY_INTENTS or (chat_context.strip() and label not in CONTEXT_FREE_INTENTS):
+        print(f"🧭 Local intent '{label}' depends on the conversation; asking the LLM")
+        return None
+    if label == DISH_INTENT:
+        refresh_index()
+        _, title_confidence = get_title_index().lookup(query, n_results=1)
+        if title_confidence < TITLE_MATCH_CONFIDENCE:
+            return None
+        label = query.strip()
+
+    print(f"⚡ Local intent: {label} (confidence {confidence:.2f}, nearest {nearest:.2f})")
+    return label
+
+
+def train(dataset_path: str, output_path: str = INTENT_EXAMPLES_FILE):
+    """
+    Embeds the dataset queries, saves the examples and prints leave-one-out accuracy per threshold.
+    Cases with a context are skipped: their label may come from the context, which the kNN never sees.
+    """
+    with open(dataset_path, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    cases = [case for case in cases if case.get("query", "").strip() and case.get("intent", "").strip()
+             and not case.get("context", "").strip() and intent_label(case["intent"]) not in LLM_ONLY_INTENTS]
+    if not cases:
+        sys.exit(f"❌ No labelled queries in {dataset_path}")
+
+    labels = [intent_label(case["intent"]) for case in cases]
+    print(f"📥 {len(cases)} examples: " + ", ".join(f"{label} {count}" for label, count in Counter(labels).most_common()))
+    embeddings = np.array(sentence_transformer_ef([strip_diacritics(case["query"]) for case in cases]), dtype=np.float32)
+    KnnIntentClassifier.save(embeddings, labels, output_path)
+    print(f"✅ Saved intent examples to {output_path}")
+
+    results = KnnIntentClassifier(embeddings, labels).leave_one_out()
+    print(f"\n{'confidence':>10} {'coverage':>9} {'accuracy':>9}   (leave-one-out, nearest >= {INTENT_MIN_SIMILARITY})")
+    for threshold in (0.0, 0.6, 0.7, 0.8, 0.9):
+        answered = [(true, predicted) for true, predicted, confidence, nearest in results
+                    if confidence >= threshold and nearest >= INTENT_MIN_SIMILARITY]
+        accuracy = np.mean([true == predicted for true, predicted in answered]) if answered else 0.0
+        print(f"{threshold:>10.1f} {len(answered) / len(results):>9.1%} {accuracy:>9.1%}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python intent_knn.py <dataset.jsonl> [output.npz]")
+    train(*sys.argv[1:3])
@@ -0,0 +1,119 @@
+import math
+import re
+from collections import defaultdict, Counter
+from typing import List, Dict, Any, Callable, Iterable, Tuple
+from arabic_text import normalize_arabic
+
+_TOKEN_RE = re.compile(r'[ء-يa-zA-Z0-9]+')
+
+# Words that say "I want a recipe" rather than which recipe (already alef/ta-marbuta normalized)
+ARABIC_STOPWORDS = {
+    "من", "في", "علي", "الي", "عن", "مع", "او", "ثم", "لو", "ده", "دي", "دا", "اللي", "كل",
+    "وصفه", "وصفات", "اكله", "اكلات", "طريقه", "عمل", "عايز", "عايزه", "هاتلي", "هات", "ممكن", "انا",
+}
+
+
+def light_stem(token: str) -> str:
+    """Drops the definite article and the attached و/ب/ل prefixes so "الحريره" matches "حريره"."""
+    for prefix in ("وال", "بال", "لل", "ال"):
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            return token[len(prefix):]
+    return token
+
+
+def tokenize(text: str, normalize: Callable[[str], str] = normalize_arabic) -> List[str]:
+    tokens = []
+    for token in _TOKEN_RE.findall(normalize(text)):
+        if token in ARABIC_STOPWORDS or len(token) < 2:
+            continue
+        tokens.append(light_stem(token))
+    return tokens
+
+
+class BM25Index:
+    """
+    Arabic-normalized inverted index with BM25 scoring over two fields (title and body).
+    A query only touches the posting lists of its own terms, so exact dish names are
+    answered in microseconds without the embedding model.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]], normalize: Callable[[str], str] = normalize_arabic,
+                 k1: float = 1.5, b: float = 0.75, title_boost: float = 3.0):
+        self.normalize = normalize
+        self.k1 = k1
+        self.b = b
+        self.title_boost = title_boost
+        self.records = []  # only {"id", "title"}; bodies are tokenized and dropped
+        self.title_tokens = []
+        self._fields = {"title": self._new_field(), "body": self._new_field()}
+
+        for doc_idx, record in enumerate(records):
+            self.records.append({"id": record["id"], "title": record["title"]})
+            title_tokens = tokenize(record.get("title", ""), normalize)
+            self.title_tokens.append(set(title_tokens))
+            self._add(self._fields["title"], doc_idx, title_tokens)
+            self._add(self._fields["body"], doc_idx, tokenize(record.get("document", ""), normalize))
+
+        for field in self._fields.values():
+            field["avg_len"] = (sum(field["lengths"]) / len(field["lengths"])) if field["lengths"] else 0.0
+
+    @staticmethod
+    def _new_field():
+        return {"postings": defaultdict(list), "lengths": [], "avg_len": 0.0}
+
+    @staticmethod
+    def _add(field, doc_idx: int, tokens: List[str]):
+        field["lengths"].append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            field["postings"][term].append((doc_idx, tf))
+
+    def __len__(self):
+        return len(self.records)
+
+    def _score_field(self, field, terms: List[str], scores: Dict[int, float], weight: float):
+        n_docs = len(self.records)
+        for term in terms:
+            postings = field["postings"].get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_idx, tf in postings:
+                length_norm = 1 - self.b + self.b * field["lengths"][doc_idx] / (field["avg_len"] or 1.0)
+                scores[doc_idx] += weight * idf * tf * (self.k1 + 1) / (tf + self.k1 * length_norm)
+
+    def search(self, query: str, n_results: int = 10) -> List[Dict[str, Any]]:
+        terms = list(dict.fromkeys(tokenize(query, self.normalize)))
+        if not terms:
+            return []
+
+        scores = defaultdict(float)
+        self._score_field(self._fields["title"], terms, scores, self.title_boost)
+        self._score_field(self._fields["body"], terms, scores, 1.0)
+
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:n_results]
+        query_terms = set(terms)
+        hits = []
+        for doc_idx, score in ranked:
+            record = self.records[doc_idx]
+            hits.append({
+                "id": record["id"],
+                "title": record["title"],
+                "bm25": score,
+                # Every query term appears in the title: an exact dish-name hit
+                "title_match": query_terms <= self.title_tokens[doc_idx],
+            })
+        return hits
+
+
+def reciprocal_rank_fusion(ranked_lists: List[List[Dict[str, Any]]], k: int = 60) -> List[Tuple[float, Dict[str, Any]]]:
+    """
+    Fuses several ranked hit lists by id: score = sum(1 / (k + rank)).
+    Hits seen in more than one list are merged, so vector distances and BM25 flags are both kept.
+    """
+    fused = {}
+    for hits in ranked_lists:
+        for rank, hit in enumerate(hits, 1):
+            score, merged = fused.get(hit["id"], (0.0, {}))
+            merged.update(hit)
+            fused[hit["id"]] = (score + 1.0 / (k + rank), merged)
+    return sorted(fused.values(), key=lambda item: -item[0])
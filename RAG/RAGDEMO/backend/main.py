@@ -12,7 +12,7 @@ from utils import create_user, get_user_by_email, verify_password, add_recipe_to
 from fastapi.middleware.cors import CORSMiddleware
 from myChatBot import WebSocketBotSession
 from services.schemas import CalendarEventCreate, FreeBusyRequest, CalendarEventUpdate
-from groq import Groq
+from groq_client import get_async_groq, aclose_groq
 from datetime import datetime, timedelta, timezone
 from services.google_calendar_service import update_calendar_event, delete_calendar_event
 from elevenlabs import ElevenLabs
@@ -74,6 +74,7 @@ async def lifespan(app: FastAPI):
           # The code below will run on shutdown.
     print("Closing MongoDB connection...")
     client.close()
+    await aclose_groq()
     print("MongoDB connection closed. FastAPI application stopped.")
 
 # Pass the lifespan context manager to the FastAPI app instance
@@ -89,7 +90,6 @@ app.add_middleware(
 )
 
 sessions = {}
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY")) # Renamed 'client' to 'groq_client' to avoid conflict with MongoDB client
 
 # --- REMOVE THE OLD @app.on_event FUNCTIONS BELOW ---
 # @app.on_event("startup")
@@ -272,7 +272,7 @@ async def transcribe_audio_endpoint(file: UploadFile = File(...)): # Renamed
         wav_buffer = io.BytesIO(contents)
         wav_buffer.name = "audio.wav"
 
-        transcription = groq_client.audio.transcriptions.create( # Use groq_client
+        transcription = await get_async_groq().audio.transcriptions.create( # Shared pooled client (groq_client.py)
             file=wav_buffer,
             model="whisper-large-v3",
             language="ar",
@@ -663,6 +663,10 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
     # Initial session creation, will fetch user_data later
     session = None # Initialize session to None or a placeholder
 
+    async def send_delta(delta: str):
+        # Token deltas of a generated reply; the full text still follows as a "response" message
+        await websocket.send_json({"type": "delta", "message": delta})
+
     try:
         # Step 1: Wait for email (identifier)
         await websocket.send_json({
@@ -685,6 +689,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
 
         # Create the session AFTER fetching user_data
         session = WebSocketBotSession(user_id=user_id, db=db)
+        session.on_delta = send_delta
 
         # Step 2: Use user data from DB to set session
         session.set_user_info(
@@ -721,6 +726,7 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
 
                 # Create a NEW session instance with the UPDATED user_data
                 session = WebSocketBotSession(user_id=user_id, db=db)
+                session.on_delta = send_delta
                 session.set_user_info(
                     name=user_data.get("name", ""),
                     gender=user_data.get("gender", "male"),
@@ -0,0 +1,90 @@
+import zlib
+from collections import defaultdict
+from typing import Dict, Set
+
+import numpy as np
+from lexical_index import tokenize
+
+SHINGLE_SIZE = 3  # words per shingle
+NUM_PERMUTATIONS = 128
+LSH_BANDS = 16  # 16 bands x 8 rows: pairs above ~0.7 Jaccard almost always share a bucket
+DUPLICATE_SIMILARITY = 0.8  # estimated Jaccard at which two recipes are collapsed
+
+_PRIME = (1 << 31) - 1  # a * x + b stays below 2**63 for a, b, x < 2**31, so uint64 never overflows
+_rng = np.random.default_rng(1)  # fixed, so stored signatures stay comparable across runs
+_A = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+_B = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def body_shingles(full_text: str) -> Set[str]:
+    """Word shingles of the normalized, stemmed recipe body (the title line is left out)."""
+    _, _, body = full_text.partition("\n")
+    tokens = tokenize(body)
+    if len(tokens) < SHINGLE_SIZE:
+        return set(tokens)
+    return {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def minhash_signature(full_text: str) -> np.ndarray:
+    """NUM_PERMUTATIONS min-hashes (uint32) of the body shingles; empty for a recipe without a body."""
+    shingles = body_shingles(full_text)
+    if not shingles:
+        return np.zeros(0, dtype=np.uint32)
+    hashes = np.array([zlib.crc32(shingle.encode("utf-8")) for shingle in shingles], dtype=np.uint64) % _PRIME
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def to_bytes(signature: np.ndarray) -> bytes:
+    return signature.astype(np.uint32).tobytes()
+
+
+def from_bytes(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+def find_duplicates(signatures: Dict[str, np.ndarray], text_lengths: Dict[str, int]) -> Dict[str, str]:
+    """
+    Groups near-duplicate recipes: LSH banding proposes pairs that share a band, the pairs whose
+    estimated Jaccard reaches DUPLICATE_SIMILARITY are merged (transitively), and each group keeps
+    its longest text as the canonical recipe (ties: smallest id, so the choice is stable).
+    Returns duplicate id -> canonical id.
+    """
+    ids = sorted(id_ for id_, signature in signatures.items() if len(signature) == NUM_PERMUTATIONS)
+    if len(ids) < 2:
+        return {}
+    matrix = np.stack([signatures[id_] for id_ in ids])
+
+    parent = list(range(len(ids)))
+
+    def root(row):
+        while parent[row] != row:
+            parent[row] = parent[parent[row]]
+            row = parent[row]
+        return row
+
+    rows_per_band = NUM_PERMUTATIONS // LSH_BANDS
+    checked = set()
+    for band in range(LSH_BANDS):
+        buckets = defaultdict(list)
+        for row, key in enumerate(matrix[:, band * rows_per_band:(band + 1) * rows_per_band]):
+            buckets[key.tobytes()].append(row)
+        for rows in buckets.values():
+            for i, first in enumerate(rows):
+                for second in rows[i + 1:]:
+                    if (first, second) in checked:
+                        continue
+                    checked.add((first, second))
+                    if np.mean(matrix[first] == matrix[second]) >= DUPLICATE_SIMILARITY:
+                        parent[root(second)] = root(first)
+
+    groups = defaultdict(list)
+    for row, id_ in enumerate(ids):
+        groups[root(row)].append(id_)
+
+    duplicates = {}
+    for members in groups.values():
+        if len(members) < 2:
+            continue
+        canonical = min(members, key=lambda id_: (-text_lengths.get(id_, 0), id_))
+        duplicates.update({id_: canonical for id_ in members if id_ != canonical})
+    return duplicates
@@ -0,0 +1,143 @@
+import json
+import os
+from collections import Counter
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+from vector_index import INDEX_DIR, normalize_rows
+
+CLUSTERS_FILE = "clusters.json"
+CENTROIDS_FILE = "cluster_centroids.npy"
+DEFAULT_CLUSTER_COUNT = int(os.getenv("RECIPE_CLUSTERS", "12"))
+REPRESENTATIVES_PER_CLUSTER = 7
+DOMINANT_SHARE = 0.6  # a facet value names the cluster when this share of its recipes has it
+
+# Display names for the metadata facets (recipe_metadata.py) used to label clusters
+CATEGORY_LABELS = {
+    "soup": "الشوربات", "salad": "السلطات", "dip": "الصوصات والغموس", "sandwich": "السندوتشات",
+    "pasta": "المكرونة", "stuffed": "المحشي", "rice": "أطباق الرز", "grill": "المشويات", "main": "الأطباق الرئيسية",
+}
+PROTEIN_LABELS = {
+    "seafood": "بالسمك والجمبري", "poultry": "بالفراخ", "meat": "باللحمة", "vegetarian": "من غير لحمة",
+}
+
+
+def spherical_kmeans(matrix: np.ndarray, k: int, iterations: int = 50, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    k-means on unit vectors with cosine similarity (k-means++ seeding, fixed seed so an
+    unchanged corpus gets the same clusters). Returns (unit centroids [k x dim], assignment per row).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(matrix)
+    k = max(1, min(k, n))
+
+    centroids = [matrix[rng.integers(n)]]
+    distance = 1.0 - matrix @ centroids[0]
+    for _ in range(1, k):
+        weights = np.clip(distance, 0.0, None) ** 2
+        total = weights.sum()
+        pick = rng.choice(n, p=weights / total) if total > 0 else rng.integers(n)
+        centroids.append(matrix[pick])
+        distance = np.minimum(distance, 1.0 - matrix @ centroids[-1])
+    centroids = np.array(centroids, dtype=np.float32)
+
+    for _ in range(iterations):
+        assignments = np.argmax(matrix @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        counts = np.bincount(assignments, minlength=k)
+        sums[counts == 0] = centroids[counts == 0]  # an emptied cluster keeps its old centroid
+        updated = normalize_rows(sums)
+        if np.allclose(updated, centroids, atol=1e-6):
+            break
+        centroids = updated
+
+    return centroids, np.argmax(matrix @ centroids.T, axis=1)
+
+
+def cluster_label(members_metadata: List[Dict[str, Any]]) -> str:
+    """Names a cluster after its dominant category, plus its dominant protein when one stands out."""
+    categories = Counter(metadata.get("category", "main") for metadata in members_metadata)
+    proteins = Counter(metadata.get("main_protein") for metadata in members_metadata)
+    category, _ = categories.most_common(1)[0]
+    protein, protein_count = proteins.most_common(1)[0]
+    label = CATEGORY_LABELS.get(category, CATEGORY_LABELS["main"])
+    if protein in PROTEIN_LABELS and protein_count >= DOMINANT_SHARE * len(members_metadata):
+        label = f"{label} {PROTEIN_LABELS[protein]}"
+    return label
+
+
+class RecipeClusters:
+    """
+    Offline clustering of the recipe embeddings. Each recipe's cluster id is stored in its
+    metadata ("cluster"), so a vague request ("أنا عايز شوربة") maps to the nearest centroid
+    and then to a filtered index search inside that cluster.
+    """
+
+    def __init__(self, centroids: np.ndarray, clusters: List[Dict[str, Any]]):
+        self.centroids = centroids
+        self.clusters = clusters  # [{"id", "label", "size", "representatives"}]
+
+    @classmethod
+    def build(cls, ids: List[str], embeddings, metadata: Dict[str, Dict[str, Any]],
+              titles: Dict[str, str] = None, k: int = DEFAULT_CLUSTER_COUNT) -> Tuple["RecipeClusters", List[int]]:
+        """
+        Returns the clusters and the cluster id of every row of `embeddings`. Clusters that
+        would share a label are told apart by their most central recipe title.
+        """
+        if not len(ids):
+            return cls(np.zeros((0, 0), dtype=np.float32), []), []
+        matrix = normalize_rows(embeddings)
+        centroids, assignments = spherical_kmeans(matrix, k)
+        similarity = np.einsum("ij,ij->i", matrix, centroids[assignments])
+
+        clusters = []
+        for cluster_id in range(len(centroids)):
+            rows = np.flatnonzero(assignments == cluster_id)
+            rows = rows[np.argsort(-similarity[rows])]
+            clusters.append({
+                "id": cluster_id,
+                "label": cluster_label([metadata.get(ids[row], {}) for row in rows]) if len(rows) else "",
+                "size": int(len(rows)),
+                "representatives": [ids[row] for row in rows[:REPRESENTATIVES_PER_CLUSTER]],
+            })
+
+        label_counts = Counter(cluster["label"] for cluster in clusters)
+        for cluster in clusters:
+            if label_counts[cluster["label"]] > 1 and titles and cluster["representatives"]:
+                cluster["label"] = f"{cluster['label']} زي {titles.get(cluster['representatives'][0], '').strip()}"
+        return cls(centroids, clusters), [int(a) for a in assignments]
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def nearest(self, embedding) -> Tuple[Optional[Dict[str, Any]], float]:
+        """(cluster, cosine similarity) of the centroid closest to `embedding`; empty clusters never match."""
+        if not self.clusters:
+            return None, -1.0
+        scores = self.centroids @ normalize_rows(embedding)[0]
+        scores[[cluster["size"] == 0 for cluster in self.clusters]] = -np.inf
+        best = int(np.argmax(scores))
+        return self.clusters[best], float(scores[best])
+
+    def save(self, index_dir: str = INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        centroids_path = os.path.join(index_dir, CENTROIDS_FILE)
+        clusters_path = os.path.join(index_dir, CLUSTERS_FILE)
+        with open(centroids_path + ".tmp", "wb") as f:
+            np.save(f, self.centroids)
+        with open(clusters_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.clusters, f, ensure_ascii=False, indent=1)
+        os.replace(centroids_path + ".tmp", centroids_path)
+        os.replace(clusters_path + ".tmp", clusters_path)
+
+    @classmethod
+    def load(cls, index_dir: str = INDEX_DIR) -> "RecipeClusters":
+        with open(os.path.join(index_dir, CLUSTERS_FILE), "r", encoding="utf-8") as f:
+            clusters = json.load(f)
+        return cls(np.load(os.path.join(index_dir, CENTROIDS_FILE)), clusters)
+
+    @staticmethod
+    def exists(index_dir: str = INDEX_DIR) -> bool:
+        return (os.path.exists(os.path.join(index_dir, CLUSTERS_FILE))
+                and os.path.exists(os.path.join(index_dir, CENTROIDS_FILE)))
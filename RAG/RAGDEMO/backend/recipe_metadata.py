@@ -0,0 +1,71 @@
+from typing import List, Dict, Any, Iterable
+from ingredient_index import phrase_tokens
+
+
+def _stems(phrases: Iterable[str]) -> List[frozenset]:
+    return [frozenset(phrase_tokens(phrase)) for phrase in phrases]
+
+
+def _mentions(stems: set, phrases: List[frozenset]) -> bool:
+    """True when every stem of at least one keyword phrase is present ("جبنة مشوية" needs both words)."""
+    return any(phrase <= stems for phrase in phrases)
+
+
+# Title keywords -> dish category (first matching rule wins, "main" otherwise)
+CATEGORY_RULES = [
+    ("soup", _stems(["شوربة", "كشك"])),
+    ("salad", _stems(["سلطة", "تبولة", "فتوش", "بابا غنوج"])),
+    ("dip", _stems(["صلصة الأفوكادو", "تومية", "مايونيز", "زبدة الأعشاب", "تتبيلة", "حمص بالطحينة"])),
+    ("sandwich", _stems(["سندوتشات", "شاورما", "فاهيتا", "طرب"])),
+    ("pasta", _stems(["مكرونة", "لازانيا", "كانيولوني", "سباجتي", "ريجاتوني", "نجرسكو"])),
+    ("stuffed", _stems(["محشي", "ورق عنب", "محشية", "كبة"])),
+    ("rice", _stems(["رز", "كبسة", "مندي", "مقلوبة", "برياني", "صيادية", "كشري"])),
+    ("grill", _stems(["مشوي", "مشوية", "شيش", "كباب", "تندوري"])),
+]
+
+# Light dishes are dinner/snack food, everything else is a lunch main; breakfast dishes are named explicitly
+BREAKFAST_DISHES = _stems(["فول", "طعمية", "جبنة مشوية", "بانكيك", "كروكيت"])
+MEAL_TYPE_BY_CATEGORY = {"soup": "dinner", "salad": "dinner", "dip": "dinner", "sandwich": "dinner"}
+
+# Checked in this order, first on the title (it names the protein), then on the ingredients
+PROTEIN_RULES = [
+    ("seafood", _stems(["جمبري", "سمك", "سلمون", "تونة", "رنجة", "حوت", "سي فوود", "كاليماري"])),
+    ("poultry", _stems(["فراخ", "دجاج", "حمام", "رومي", "قوانص"])),
+    ("meat", _stems(["لحمة", "لحم", "كفتة", "ضاني", "بتلو", "كبدة", "كوارع", "عكاوي", "سجق", "موزة", "كرشة"])),
+]
+
+ALLERGEN_RULES = {
+    "has_gluten": _stems(["دقيق", "عيش", "مكرونة", "شعرية", "خبز", "بقسماط", "فريك", "برغل", "تورتيلا", "لسان العصفور",
+                          "لازانيا", "بشاميل", "كانيولوني", "سباجتي", "ريجاتوني", "نجرسكو"]),
+    "has_dairy": _stems(["لبن", "جبنة", "زبدة", "كريمة", "زبادي", "قشطة", "بشاميل", "ريكوتا", "موتزاريلا", "بارميزان"]),
+    "has_egg": _stems(["بيض", "بيضة", "مايونيز"]),
+    "has_seafood": _stems(["جمبري", "سمك", "سلمون", "تونة", "رنجة", "كابوريا", "كاليماري", "سي فوود"]),
+    "has_nuts": _stems(["جوز", "لوز", "بندق", "فستق", "كاجو", "سوداني", "مكسرات", "صنوبر"]),
+    "has_sesame": _stems(["سمسم", "طحينة"]),
+}
+
+METADATA_FIELDS = ["category", "meal_type", "main_protein"] + list(ALLERGEN_RULES)
+
+
+def derive_metadata(title: str, ingredients: List[str]) -> Dict[str, Any]:
+    """
+    Structured, filterable facets for one recipe, from its title and ingredient tokens
+    (ingredient_index.ingredient_tokens). Values are plain str/bool so they fit Chroma metadata.
+    """
+    title_stems = phrase_tokens(title)
+    ingredient_stems = set(ingredients)
+
+    category = next((name for name, keys in CATEGORY_RULES if _mentions(title_stems, keys)), "main")
+    if category == "main" and _mentions(title_stems, BREAKFAST_DISHES):
+        meal_type = "breakfast"
+    else:
+        meal_type = MEAL_TYPE_BY_CATEGORY.get(category, "lunch")
+
+    protein = next((name for name, keys in PROTEIN_RULES if _mentions(title_stems, keys)), None)
+    if protein is None:
+        protein = next((name for name, keys in PROTEIN_RULES if _mentions(ingredient_stems, keys)), "vegetarian")
+
+    metadata = {"category": category, "meal_type": meal_type, "main_protein": protein}
+    for flag, keys in ALLERGEN_RULES.items():
+        metadata[flag] = _mentions(ingredient_stems | title_stems, keys)
+    return metadata
@@ -0,0 +1,180 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import List, Dict, Any, Iterable
+from vector_index import INDEX_DIR
+
+RECIPE_STORE_FILE = "recipes.sqlite3"
+
+
+class RecipeStore:
+    """
+    Compact document store keyed by recipe id (SQLite, one row per recipe).
+    Vector indexes hold only ids + vectors; titles and full texts are fetched from here
+    on demand, for the handful of hits that are actually shown.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.path = os.path.join(index_dir, RECIPE_STORE_FILE)
+        self._local = threading.local()  # sqlite connections must not be shared across threads
+
+    @staticmethod
+    def exists(index_dir: str = INDEX_DIR) -> bool:
+        return os.path.exists(os.path.join(index_dir, RECIPE_STORE_FILE))
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path)
+            conn.execute("CREATE TABLE IF NOT EXISTS recipes (id TEXT PRIMARY KEY, title TEXT NOT NULL, full_text TEXT NOT NULL)")
+            # Inverted ingredient index (see ingredient_index.py): one row per (token, recipe)
+            conn.execute("CREATE TABLE IF NOT EXISTS recipe_ingredients (token TEXT NOT NULL, recipe_id TEXT NOT NULL, "
+                         "PRIMARY KEY (token, recipe_id))")
+            conn.execute("CREATE INDEX IF NOT EXISTS recipe_ingredients_by_recipe ON recipe_ingredients (recipe_id)")
+            # Filterable facets (see recipe_metadata.py), stored as JSON
+            conn.execute("CREATE TABLE IF NOT EXISTS recipe_metadata (recipe_id TEXT PRIMARY KEY, metadata TEXT NOT NULL)")
+            # Near-duplicate detection (see near_duplicates.py): MinHash signature per recipe, and
+            # duplicate -> canonical recipe; duplicates stay stored but are left out of every index
+            conn.execute("CREATE TABLE IF NOT EXISTS recipe_signatures (recipe_id TEXT PRIMARY KEY, signature BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS recipe_duplicates (recipe_id TEXT PRIMARY KEY, canonical_id TEXT NOT NULL)")
+            self._local.conn = conn
+        return conn
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def upsert_many(self, records: Iterable[Dict[str, Any]]):
+        """
+        Writes recipes; records carrying an "ingredients" token list or a "metadata" dict
+        also replace their ingredient rows / metadata.
+        """
+        records = list(records)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO recipes (id, title, full_text) VALUES (?, ?, ?)",
+                [(record["id"], record["title"], record["full_text"]) for record in records]
+            )
+            with_ingredients = [record for record in records if "ingredients" in record]
+            self.conn.executemany("DELETE FROM recipe_ingredients WHERE recipe_id = ?",
+                                  [(record["id"],) for record in with_ingredients])
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO recipe_ingredients (token, recipe_id) VALUES (?, ?)",
+                [(token, record["id"]) for record in with_ingredients for token in record["ingredients"]]
+            )
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO recipe_metadata (recipe_id, metadata) VALUES (?, ?)",
+                [(record["id"], json.dumps(record["metadata"], ensure_ascii=False))
+                 for record in records if "metadata" in record]
+            )
+
+    def delete_many(self, ids: List[str]):
+        with self.conn:
+            self.conn.executemany("DELETE FROM recipes WHERE id = ?", [(id_,) for id_ in ids])
+            self.conn.executemany("DELETE FROM recipe_ingredients WHERE recipe_id = ?", [(id_,) for id_ in ids])
+            self.conn.executemany("DELETE FROM recipe_metadata WHERE recipe_id = ?", [(id_,) for id_ in ids])
+            self.conn.executemany("DELETE FROM recipe_signatures WHERE recipe_id = ?", [(id_,) for id_ in ids])
+            self.conn.executemany("DELETE FROM recipe_duplicates WHERE recipe_id = ? OR canonical_id = ?",
+                                  [(id_, id_) for id_ in ids])
+
+    def ids(self) -> List[str]:
+        return [row[0] for row in self.conn.execute("SELECT id FROM recipes")]
+
+    def canonical_ids(self) -> List[str]:
+        """Ids of the recipes that are indexed, i.e. every stored recipe that is not a near-duplicate."""
+        return [row[0] for row in self.conn.execute(
+            "SELECT id FROM recipes WHERE id NOT IN (SELECT recipe_id FROM recipe_duplicates)")]
+
+    def get_titles(self, ids: List[str]) -> Dict[str, str]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(f"SELECT id, title FROM recipes WHERE id IN ({placeholders})", list(ids))
+        return dict(rows)
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(f"SELECT id, title, full_text FROM recipes WHERE id IN ({placeholders})", list(ids))
+        return {id_: {"id": id_, "title": title, "full_text": full_text} for id_, title, full_text in rows}
+
+    def get_text(self, recipe_id: str):
+        row = self.conn.execute("SELECT full_text FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        return row[0] if row else None
+
+    def iter_records(self, batch_size: int = 500):
+        """
+        Streams (id, title, full_text) of the canonical recipes for index builds, without
+        loading the whole corpus at once.
+        """
+        cursor = self.conn.execute("SELECT id, title, full_text FROM recipes "
+                                   "WHERE id NOT IN (SELECT recipe_id FROM recipe_duplicates) ORDER BY id")
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            for id_, title, full_text in rows:
+                yield {"id": id_, "title": title, "document": full_text}
+
+    def ingredient_pairs(self):
+        """Yields (ingredient token, recipe id) rows for IngredientIndex.from_pairs()."""
+        yield from self.conn.execute("SELECT token, recipe_id FROM recipe_ingredients")
+
+    def ids_without_ingredients(self) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT id FROM recipes WHERE id NOT IN (SELECT DISTINCT recipe_id FROM recipe_ingredients)")]
+
+    def get_metadata(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        rows = self.conn.execute(f"SELECT recipe_id, metadata FROM recipe_metadata WHERE recipe_id IN ({placeholders})",
+                                 list(ids))
+        return {id_: json.loads(metadata) for id_, metadata in rows}
+
+    def update_metadata(self, metadata: Dict[str, Dict[str, Any]]):
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE recipe_metadata SET metadata = ? WHERE recipe_id = ?",
+                [(json.dumps(values, ensure_ascii=False), id_) for id_, values in metadata.items()]
+            )
+
+    def ids_without_metadata(self) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT id FROM recipes WHERE id NOT IN (SELECT recipe_id FROM recipe_metadata)")]
+
+    def text_lengths(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT id, length(full_text) FROM recipes"))
+
+    def signatures(self) -> Dict[str, bytes]:
+        return dict(self.conn.execute("SELECT recipe_id, signature FROM recipe_signatures"))
+
+    def save_signatures(self, signatures: Dict[str, bytes]):
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO recipe_signatures (recipe_id, signature) VALUES (?, ?)",
+                                  list(signatures.items()))
+
+    def ids_without_signature(self) -> List[str]:
+        return [row[0] for row in self.conn.execute(
+            "SELECT id FROM recipes WHERE id NOT IN (SELECT recipe_id FROM recipe_signatures)")]
+
+    def duplicates(self) -> Dict[str, str]:
+        """Near-duplicate id -> id of the canonical recipe it was collapsed into."""
+        return dict(self.conn.execute("SELECT recipe_id, canonical_id FROM recipe_duplicates"))
+
+    def set_duplicates(self, duplicates: Dict[str, str]):
+        with self.conn:
+            self.conn.execute("DELETE FROM recipe_duplicates")
+            self.conn.executemany("INSERT INTO recipe_duplicates (recipe_id, canonical_id) VALUES (?, ?)",
+                                  list(duplicates.items()))
+
+    def alias_titles(self) -> Dict[str, List[str]]:
+        """Canonical id -> titles of the near-duplicates collapsed into it."""
+        aliases = {}
+        for canonical_id, title in self.conn.execute(
+                "SELECT d.canonical_id, r.title FROM recipe_duplicates d JOIN recipes r ON r.id = d.recipe_id"):
+            aliases.setdefault(canonical_id, []).append(title)
+        return aliases
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, Any, List, Tuple
+
+import numpy as np
+from vector_index import INDEX_DIR, normalize_rows
+
+# Zero-shot tags: a recipe gets a tag when its embedding is close to the tag's prototype phrases
+TAG_PROTOTYPES = {
+    "breakfast": ["فطار", "أكلة فطار الصبح"],
+    "dessert": ["حلويات", "حاجة حلوة بالسكر"],
+    "soup": ["شوربة"],
+    "salad": ["سلطة"],
+    "appetizer": ["مقبلات", "غموس وصوص"],
+    "grill": ["مشويات", "مشوي على الفحم"],
+    "fried": ["مقلي", "أكلة مقرمشة في الزيت"],
+    "oven": ["صينية في الفرن"],
+    "pasta": ["مكرونة"],
+    "rice": ["رز"],
+    "seafood": ["أكل بحري", "سمك وجمبري"],
+    "chicken": ["فراخ"],
+    "meat": ["لحمة"],
+    "vegetarian": ["أكل نباتي من غير لحمة"],
+    "light": ["أكلة خفيفة", "عشا خفيف"],
+    "festive": ["عزومة", "أكلات رمضان والعزايم"],
+}
+TAG_PREFIX = "tag_"
+TAG_MIN_SIMILARITY = 0.3  # raw cosine similarity floor
+TAG_MARGIN = 0.05  # similarity above the tag's corpus average (some prototypes are close to everything)
+MAX_TAGS_PER_RECIPE = 3
+PROTOTYPES_FILE = "tag_prototypes.npz"
+
+
+def _prototypes_key(model_name: str) -> str:
+    payload = json.dumps([model_name, TAG_PROTOTYPES], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def prototypes_cached(model_name: str, index_dir: str = INDEX_DIR) -> bool:
+    """False when TAG_PROTOTYPES or the model changed since the corpus was last tagged."""
+    path = os.path.join(index_dir, PROTOTYPES_FILE)
+    return os.path.exists(path) and str(np.load(path)["key"]) == _prototypes_key(model_name)
+
+
+def load_prototypes(encode: Callable[[List[str]], np.ndarray], model_name: str,
+                    index_dir: str = INDEX_DIR) -> Tuple[List[str], np.ndarray]:
+    """
+    (tag names, unit prototype matrix [tags x dim]); a prototype is the mean of its phrase embeddings.
+    Cached in the index dir, so the model is only needed again when the phrases or the model change.
+    """
+    path = os.path.join(index_dir, PROTOTYPES_FILE)
+    key = _prototypes_key(model_name)
+    if os.path.exists(path):
+        cached = np.load(path)
+        if str(cached["key"]) == key:
+            return list(cached["tags"]), cached["matrix"]
+
+    tags = list(TAG_PROTOTYPES)
+    phrases = [phrase for tag in tags for phrase in TAG_PROTOTYPES[tag]]
+    phrase_vectors = normalize_rows(encode(phrases))
+    matrix, start = [], 0
+    for tag in tags:
+        count = len(TAG_PROTOTYPES[tag])
+        matrix.append(phrase_vectors[start:start + count].mean(axis=0))
+        start += count
+    matrix = normalize_rows(matrix)
+
+    os.makedirs(index_dir, exist_ok=True)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, key=key, tags=np.array(tags), matrix=matrix)
+    os.replace(path + ".tmp", path)
+    return tags, matrix
+
+
+def tag_recipes(embeddings: np.ndarray, tags: List[str], prototypes: np.ndarray) -> List[List[str]]:
+    """
+    Tags every recipe row at once: one [recipes x dim] @ [dim x tags] product, then per row
+    the best MAX_TAGS_PER_RECIPE tags that clear both the similarity floor and the tag margin.
+    """
+    if not len(embeddings):
+        return []
+    scores = normalize_rows(embeddings) @ prototypes.T
+    centered = scores - scores.mean(axis=0, keepdims=True)
+    eligible = (scores >= TAG_MIN_SIMILARITY) & (centered >= TAG_MARGIN)
+    ranked = np.argsort(-centered, axis=1)[:, :MAX_TAGS_PER_RECIPE]
+    return [[tags[t] for t in row_ranked if eligible[row, t]] for row, row_ranked in enumerate(ranked)]
+
+
+def with_tags(metadata: Dict[str, Any], tags: List[str]) -> Dict[str, Any]:
+    """Replaces the tag fields of a metadata dict; only present tags are stored ({"tag_soup": True})."""
+    untagged = {key: value for key, value in metadata.items() if not key.startswith(TAG_PREFIX)}
+    return {**untagged, **{TAG_PREFIX + tag: True for tag in tags}}
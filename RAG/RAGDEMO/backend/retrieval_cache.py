@@ -0,0 +1,95 @@
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+from arabic_text import normalize_arabic
+from vector_index import normalize_rows
+
+
+@dataclass
+class CachedCandidates:
+    """Un-personalized retrieval outcome for one dish: fused candidates best first, plus the KB-gate inputs."""
+    candidates: List[Dict[str, Any]]
+    scores: List[float]
+    title_match: bool
+    best_distance: float
+
+
+class RetrievalCache:
+    """
+    Cross-session cache of retrieval candidates, keyed by the normalized dish name and the
+    metadata filter. A miss on the exact key falls back to the most similar cached query
+    embedding, so "ملوخية" and "الملوخيه بالفراخ" can share one entry above `similarity`.
+    Entries hold the candidates before allergies, dislikes and preferences are applied, so
+    every session can reuse them. Bounded LRU with a TTL; entries belong to one index
+    version and the cache is emptied when another version goes live.
+    """
+
+    def __init__(self, max_size: int = 512, ttl_seconds: float = 3600, similarity: float = 0.93):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self.version = None
+        self._entries = OrderedDict()  # (dish key, filter key) -> (expires_at, unit embedding, CachedCandidates)
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(query: str, where: Dict[str, Any] = None):
+        return normalize_arabic(query), json.dumps(where, sort_keys=True, ensure_ascii=False) if where else ""
+
+    def get(self, query: str, where: Dict[str, Any] = None, embedding=None) -> Optional[CachedCandidates]:
+        """
+        Exact-key lookup; with `embedding`, a miss falls back to the closest cached query with the
+        same filter. Misses count exact-key misses; similar hits are the misses served by similarity.
+        """
+        key, now = self._key(query, where), time.monotonic()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] >= now:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+        if embedding is None:
+            self.misses += 1
+            return None
+
+        candidates = [(k, e) for k, e in self._entries.items() if k[1] == key[1] and e[0] >= now]
+        if not candidates:
+            return None
+        similarities = np.array([e[1] for _, e in candidates]) @ normalize_rows(embedding)[0]
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity:
+            return None
+        similar_key, similar_entry = candidates[best]
+        self._entries.move_to_end(similar_key)
+        self.similar_hits += 1
+        print(f"♻️ Retrieval cache: '{query}' reuses '{similar_key[0]}' (similarity {similarities[best]:.3f})")
+        return similar_entry[2]
+
+    def put(self, query: str, embedding, value: CachedCandidates, where: Dict[str, Any] = None, version: str = None):
+        """Stores `value`; results computed against another index version than the live one are dropped."""
+        if version != self.version:
+            return
+        key = self._key(query, where)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, normalize_rows(embedding)[0], value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self, version: str = None):
+        self._entries.clear()
+        self.version = version
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.similar_hits) / total if total else 0.0,
+        }
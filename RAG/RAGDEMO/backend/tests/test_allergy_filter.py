@@ -0,0 +1,97 @@
+import os
+import sys
+
+import pytest
+
+# Allow importing backend modules when pytest runs from the repo root or from tests/
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from ingredient_index import IngredientIndex, ingredient_tokens, phrase_tokens
+from recipe_metadata import derive_metadata
+
+RECIPE_DIR = os.path.join(BACKEND_DIR, "RAGdatabase", "recipes_from_pagebreaks")
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    """The real recipes, keyed by file name: (ingredient index, id -> metadata, id -> title)."""
+    metadata, titles, pairs = {}, {}, []
+    for filename in sorted(os.listdir(RECIPE_DIR)):
+        with open(os.path.join(RECIPE_DIR, filename), "r", encoding="utf-8") as f:
+            text = f.read().strip()
+        if not text:
+            continue
+        recipe_id = os.path.splitext(filename)[0]
+        tokens = ingredient_tokens(text)
+        titles[recipe_id] = text.splitlines()[0]
+        metadata[recipe_id] = derive_metadata(titles[recipe_id], tokens)
+        pairs.extend((token, recipe_id) for token in tokens)
+    return IngredientIndex.from_pairs(pairs), metadata, titles
+
+
+def blocked_by(corpus, allergy):
+    index, metadata, _ = corpus
+    kept, _ = index.filter_hits([{"id": id_} for id_ in metadata], allergies=[allergy], metadata=metadata)
+    return set(metadata) - {hit["id"] for hit in kept}
+
+
+def flagged(corpus, flag):
+    return {id_ for id_, recipe_metadata in corpus[1].items() if recipe_metadata[flag]}
+
+
+def test_wheat_blocks_every_gluten_recipe(corpus):
+    gluten = flagged(corpus, "has_gluten")
+    assert gluten
+    assert gluten <= blocked_by(corpus, "قمح")
+
+
+def test_wheat_blocks_known_wheat_dishes(corpus):
+    titles = corpus[2]
+    lasagna = {"recipe_202", "recipe_203"}
+    assert all("لازانيا" in titles[id_] for id_ in lasagna)
+    pasta = {id_ for id_, title in titles.items() if "مكرونة" in title or "سباجتي" in title}
+    assert pasta
+    assert lasagna | pasta <= blocked_by(corpus, "قمح")
+
+
+def test_nuts_block_every_nut_recipe(corpus):
+    nuts = flagged(corpus, "has_nuts")
+    assert nuts
+    assert nuts <= blocked_by(corpus, "مكسرات")
+
+
+def test_milk_blocks_every_dairy_recipe(corpus):
+    assert flagged(corpus, "has_dairy") <= blocked_by(corpus, "لبن")
+
+
+def test_banana_does_not_block_beef_shank(corpus):
+    titles = corpus[2]
+    assert "موز" in titles["recipe_170"] and "موز" in titles["recipe_171"]
+    assert not blocked_by(corpus, "موز") & {"recipe_170", "recipe_171", "recipe_222"}
+
+
+def test_fish_blocks_the_fish_family(corpus):
+    titles = corpus[2]
+    tuna = {id_ for id_, title in titles.items() if "التونة" in title}
+    assert tuna
+    assert tuna <= blocked_by(corpus, "سمك")
+
+
+def test_stemmer_keeps_words_whose_final_ha_is_not_a_suffix():
+    assert phrase_tokens("موزة") != phrase_tokens("موز")
+    assert "جوز" not in phrase_tokens("جوزة الطيب")
+    assert phrase_tokens("بيضة") == phrase_tokens("بيض")
+
+
+def test_garlic_dislike_matches_the_egyptian_spelling(corpus):
+    index = corpus[0]
+    assert index.recipes_with("ثوم")
+    assert index.recipes_with("ثوم") == index.recipes_with("توم")
+
+
+def test_dislike_only_reorders_inside_the_cut():
+    index = IngredientIndex.from_pairs([("بصل", "molokhia_1"), ("بصل", "molokhia_2"), ("خيار", "salad")])
+    hits = [{"id": "molokhia_1"}, {"id": "molokhia_2"}, {"id": "salad"}]
+    kept, _ = index.filter_hits(hits, dislikes=["بصل"], limit=2)
+    assert [hit["id"] for hit in kept] == ["molokhia_1", "molokhia_2"]
+    assert kept[0]["dislikes"] == ["بصل"]
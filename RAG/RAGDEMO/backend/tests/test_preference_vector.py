@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+pytest.importorskip("chromadb")
+import chroma_utils
+
+# Orthogonal toy embeddings, so the preference vector's components can be read off directly
+VECTORS = {"ملوخية": [1.0, 0.0, 0.0], "كشري": [0.0, 1.0, 0.0], "بصل": [0.0, 0.0, 1.0]}
+
+
+class FakeEmbeddingService:
+    async def embed_many(self, texts):
+        return [np.array(VECTORS[text], dtype=np.float32) for text in texts]
+
+
+@pytest.fixture
+def fake_embeddings(monkeypatch):
+    monkeypatch.setattr(chroma_utils, "embedding_service", FakeEmbeddingService())
+
+
+def preference(likes, dislikes):
+    return asyncio.run(chroma_utils.abuild_preference_vector(likes, dislikes))
+
+
+def test_disliked_ingredient_is_pushed_away(fake_embeddings):
+    onion = np.array(VECTORS["بصل"])
+    assert preference(["ملوخية", "كشري"], ["بصل"]) @ onion < 0
+
+
+def test_empty_like_does_not_turn_a_dislike_into_a_like(fake_embeddings):
+    onion = np.array(VECTORS["بصل"])
+    with_empty = preference(["ملوخية", "", "كشري"], ["بصل"])
+    assert with_empty @ onion < 0
+    np.testing.assert_allclose(with_empty, preference(["ملوخية", "كشري"], ["بصل"]))
+
+
+def test_only_empty_texts_give_no_preference(fake_embeddings):
+    assert preference(["", " "], []) is None
@@ -0,0 +1,127 @@
+import json
+import os
+from collections import defaultdict
+from typing import List, Dict, Any, Iterable, Tuple
+from lexical_index import tokenize
+from vector_index import INDEX_DIR
+
+TITLE_INDEX_FILE = "title_index.json"
+NGRAM_SIZE = 3
+# A title containing every query word scores by how much of the title the query covers:
+# CONTAINMENT_SCORE + CONTAINMENT_COVERAGE_WEIGHT * coverage. Single-word queries ("فراخ", "رز")
+# are contained in dozens of titles, so they score from SINGLE_WORD_SCORE and never reach
+# the 0.8 confidence that lets match_title skip vector ranking.
+CONTAINMENT_SCORE = 0.8
+CONTAINMENT_COVERAGE_WEIGHT = 0.15
+SINGLE_WORD_SCORE = 0.6
+
+
+def title_key(text: str) -> str:
+    """Normalized, stemmed, stopword-free form of a title or query ("وصفة الكُشَري" -> "كشري")."""
+    return " ".join(tokenize(text))
+
+
+def char_ngrams(key: str, n: int = NGRAM_SIZE) -> set:
+    padded = f" {key} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+class TitleIndex:
+    """
+    Precomputed title lookup built at ingest time:
+      - `exact`: normalized title key -> entry positions (hash-map hit for canonical dish names)
+      - `ngrams`: character trigram -> entry positions (Dice similarity for typos and spelling variants)
+    A confident match answers the suggestion turn without the embedding model or the vector index.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]], exact: Dict[str, List[int]] = None,
+                 ngrams: Dict[str, List[int]] = None):
+        self.entries = entries  # [{"id", "title", "key"}]
+        if exact is None or ngrams is None:
+            exact, ngrams = self._build_maps(entries)
+        self.exact = exact
+        self.ngrams = ngrams
+        self._ngram_counts = [len(char_ngrams(entry["key"])) for entry in entries]
+
+    @classmethod
+    def build(cls, records: Iterable[Dict[str, Any]], aliases: Dict[str, List[str]] = None) -> "TitleIndex":
+        """`aliases` (recipe id -> titles of near-duplicates collapsed into it) add lookup keys for that recipe."""
+        entries = []
+        for record in records:
+            for title in [record["title"]] + (aliases or {}).get(record["id"], []):
+                entries.append({"id": record["id"], "title": record["title"], "key": title_key(title)})
+        return cls(entries)
+
+    @staticmethod
+    def _build_maps(entries: List[Dict[str, Any]]) -> Tuple[Dict[str, List[int]], Dict[str, List[int]]]:
+        exact, ngrams = defaultdict(list), defaultdict(list)
+        for pos, entry in enumerate(entries):
+            if not entry["key"]:
+                continue
+            exact[entry["key"]].append(pos)
+            for gram in char_ngrams(entry["key"]):
+                ngrams[gram].append(pos)
+        return dict(exact), dict(ngrams)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, query: str, n_results: int = 7) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Returns (matches, confidence). Confidence is 1.0 for an exact title key; when every query
+        word is in the title it grows with the share of the title the query covers ("شوربة عدس"
+        -> "شوربة عدس بالجزر" 0.90, one-word queries stay below 0.8); otherwise it is the trigram
+        Dice score. Equal scores are ordered by Dice, then by the shorter title.
+        """
+        key = title_key(query)
+        if not key:
+            return [], 0.0
+
+        scored = {pos: 1.0 for pos in self.exact.get(key, [])}
+
+        query_words = set(key.split())
+        query_grams = char_ngrams(key)
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for pos in self.ngrams.get(gram, []):
+                shared[pos] += 1
+
+        dice = {}
+        for pos, count in shared.items():
+            dice[pos] = 2.0 * count / (len(query_grams) + self._ngram_counts[pos])
+            if pos in scored:
+                continue
+            title_words = set(self.entries[pos]["key"].split())
+            if query_words <= title_words:
+                base = CONTAINMENT_SCORE if len(query_words) > 1 else SINGLE_WORD_SCORE
+                scored[pos] = base + CONTAINMENT_COVERAGE_WEIGHT * len(query_words) / len(title_words)
+            else:
+                scored[pos] = dice[pos]
+
+        def rank(item):
+            pos, score = item
+            return -score, -dice.get(pos, 1.0), len(self.entries[pos]["key"]), self.entries[pos]["id"]
+
+        best_per_recipe = {}  # a recipe matched through several of its titles is listed once
+        for pos, score in sorted(scored.items(), key=rank):
+            best_per_recipe.setdefault(self.entries[pos]["id"], (pos, score))
+        ranked = list(best_per_recipe.values())[:n_results]
+        matches = [dict(self.entries[pos], title_score=score) for pos, score in ranked]
+        return matches, (ranked[0][1] if ranked else 0.0)
+
+    def save(self, index_dir: str = INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, TITLE_INDEX_FILE)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"entries": self.entries, "exact": self.exact, "ngrams": self.ngrams}, f, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+
+    @classmethod
+    def load(cls, index_dir: str = INDEX_DIR) -> "TitleIndex":
+        with open(os.path.join(index_dir, TITLE_INDEX_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["entries"], data["exact"], data["ngrams"])
+
+    @staticmethod
+    def exists(index_dir: str = INDEX_DIR) -> bool:
+        return os.path.exists(os.path.join(index_dir, TITLE_INDEX_FILE))
@@ -0,0 +1,398 @@
+import json
+import os
+import numpy as np
+import chromadb
+from typing import List, Dict, Any
+
+# Default on-disk location of the in-process index (built by RAGdatabase/query_database.py)
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "RAGdatabase", "index")
+EMBEDDINGS_FILE = "embeddings.npy"
+IDS_FILE = "ids.json"
+METADATA_MASKS_FILE = "metadata_masks.npy"
+METADATA_BITS_FILE = "metadata_bits.json"
+CODES_FILE = "embeddings_int8.npy"
+CODE_SCALE_FILE = "embeddings_int8_scale.npy"
+RESCORE_FACTOR = 4  # int8 candidates rescored exactly per requested result
+SCAN_CHUNK_ROWS = 4096  # int8 rows widened into a cache-sized float32 buffer at a time while scanning
+FILTER_OPERATORS = ("$eq", "$ne", "$in", "$nin")
+CHROMA_SPACE = "cosine"  # Chroma collections use cosine distance, the scale NumpyVectorIndex returns
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """L2-normalizes each row so a dot product equals cosine similarity."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[None, :]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def quantize_int8(matrix: np.ndarray):
+    """
+    Symmetric per-dimension scalar quantization: code = round(x / scale) in [-127, 127] with
+    scale = max|x| / 127 over the corpus. Returns (codes int8, scale float32); x ≈ code * scale.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scale = np.abs(matrix).max(axis=0) / 127.0 if len(matrix) else np.ones(matrix.shape[1:], dtype=np.float32)
+    scale = np.where(scale > 0, scale, 1.0).astype(np.float32)
+    codes = np.clip(np.rint(matrix / scale), -127, 127).astype(np.int8)
+    return codes, scale
+
+
+def _split_condition(condition):
+    """{"$in": [...]} -> ("$in", [...]); a bare value means equality."""
+    if isinstance(condition, dict):
+        (operator, operand), = condition.items()
+        if operator not in FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator '{operator}'")
+        return operator, operand
+    return "$eq", condition
+
+
+def matches_where(metadata: Dict[str, Any], where: Dict[str, Any]) -> bool:
+    """
+    Evaluates a Chroma-style filter on one metadata dict. Supported: {"field": value},
+    {"field": {"$eq" | "$ne" | "$in" | "$nin": ...}}, {"$and": [...]}, {"$or": [...]};
+    several fields in one dict must all match.
+    """
+    for key, condition in where.items():
+        if key == "$and":
+            matched = all(matches_where(metadata, sub) for sub in condition)
+        elif key == "$or":
+            matched = any(matches_where(metadata, sub) for sub in condition)
+        else:
+            operator, operand = _split_condition(condition)
+            value = metadata.get(key)
+            if operator in ("$eq", "$ne"):
+                matched = (value == operand) == (operator == "$eq")
+            else:
+                matched = (value in operand) == (operator == "$in")
+        if not matched:
+            return False
+    return True
+
+
+def to_chroma_where(where: Dict[str, Any]):
+    """Chroma wants exactly one key per filter dict, so multi-field filters become an explicit $and."""
+    if not where:
+        return None
+    clauses = []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            clauses.append({key: [to_chroma_where(sub) for sub in condition]})
+        else:
+            clauses.append({key: condition})
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+class MetadataBitmask:
+    """
+    Per-row filter bitmask for the in-process index: every (field, value) pair seen at build
+    time gets one bit, and each recipe row stores the OR of its pairs in as many uint64 words
+    as the vocabulary needs. A filter becomes a few vectorized AND/compare ops over the mask
+    columns, before any vector is read.
+    """
+
+    def __init__(self, bits: Dict[str, int], masks: np.ndarray):
+        self.bits = bits  # "field=value" -> bit position
+        self.masks = masks  # [rows x words] uint64
+
+    @staticmethod
+    def pair_key(field: str, value) -> str:
+        """
+        One key per value that == treats as equal (as matches_where does): False, 0 and 0.0
+        all become "field=0", True, 1 and 1.0 become "field=1".
+        """
+        if isinstance(value, bool) or (isinstance(value, float) and value.is_integer()):
+            value = int(value)
+        return f"{field}={value}"
+
+    @classmethod
+    def encode(cls, metadatas: List[Dict[str, Any]]) -> "MetadataBitmask":
+        pairs = sorted({cls.pair_key(field, value) for metadata in metadatas for field, value in metadata.items()})
+        bits = {pair: i for i, pair in enumerate(pairs)}
+        masks = np.zeros((len(metadatas), max(1, (len(pairs) + 63) // 64)), dtype=np.uint64)
+        for row, metadata in enumerate(metadatas):
+            for field, value in metadata.items():
+                bit = bits[cls.pair_key(field, value)]
+                masks[row, bit // 64] |= np.uint64(1 << (bit % 64))
+        return cls(bits, masks)
+
+    def _mask_for(self, field: str, values) -> np.ndarray:
+        mask = np.zeros(self.masks.shape[1], dtype=np.uint64)
+        for value in values:
+            bit = self.bits.get(self.pair_key(field, value))
+            if bit is not None:
+                mask[bit // 64] |= np.uint64(1 << (bit % 64))
+        return mask
+
+    def select(self, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask of the records matching `where` (same semantics as matches_where)."""
+        rows = np.ones(len(self.masks), dtype=bool)
+        for key, condition in where.items():
+            if key == "$and":
+                for sub in condition:
+                    rows &= self.select(sub)
+            elif key == "$or":
+                any_rows = np.zeros(len(self.masks), dtype=bool)
+                for sub in condition:
+                    any_rows |= self.select(sub)
+                rows &= any_rows
+            else:
+                operator, operand = _split_condition(condition)
+                values = operand if operator in ("$in", "$nin") else [operand]
+                has_value = ((self.masks & self._mask_for(key, values)) != 0).any(axis=1)
+                rows &= has_value if operator in ("$eq", "$in") else ~has_value
+        return rows
+
+    def save(self, index_dir: str):
+        masks_path = os.path.join(index_dir, METADATA_MASKS_FILE)
+        bits_path = os.path.join(index_dir, METADATA_BITS_FILE)
+        with open(masks_path + ".tmp", "wb") as f:
+            np.save(f, self.masks)
+        with open(bits_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(self.bits, f, ensure_ascii=False)
+        os.replace(masks_path + ".tmp", masks_path)
+        os.replace(bits_path + ".tmp", bits_path)
+
+    @classmethod
+    def load(cls, index_dir: str) -> "MetadataBitmask":
+        with open(os.path.join(index_dir, METADATA_BITS_FILE), "r", encoding="utf-8") as f:
+            bits = json.load(f)
+        return cls(bits, np.load(os.path.join(index_dir, METADATA_MASKS_FILE)))
+
+    @staticmethod
+    def exists(index_dir: str) -> bool:
+        return (os.path.exists(os.path.join(index_dir, METADATA_MASKS_FILE))
+                and os.path.exists(os.path.join(index_dir, METADATA_BITS_FILE)))
+
+
+class NumpyVectorIndex:
+    """
+    In-process vector index: unit-normalized float32 embeddings in a memory-mapped .npy
+    matrix plus a JSON list of the matching recipe ids. Texts live in the recipe store.
+    Top-k is one matrix-vector product, and the mmap'd pages are shared read-only
+    between every uvicorn worker on the box. Metadata filters are resolved on a bitmask
+    column first, so a filtered query only multiplies the matching rows.
+    """
+    remote = False
+
+    def __init__(self, index_dir: str = INDEX_DIR):
+        self.index_dir = index_dir
+        self.embeddings = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, IDS_FILE), "r", encoding="utf-8") as f:
+            self.ids = json.load(f)
+
+        if len(self.ids) != self.embeddings.shape[0]:
+            raise ValueError(f"Index at '{index_dir}' is inconsistent: "
+                             f"{len(self.ids)} ids vs {self.embeddings.shape[0]} vectors")
+
+        self._rows = None  # id -> row, built on first get_vectors()
+
+        self.metadata = MetadataBitmask.load(index_dir) if MetadataBitmask.exists(index_dir) else None
+        if self.metadata is not None and len(self.metadata.masks) != len(self.ids):
+            raise ValueError(f"Index at '{index_dir}' is inconsistent: "
+                             f"{len(self.ids)} ids vs {len(self.metadata.masks)} metadata rows")
+
+    @staticmethod
+    def exists(index_dir: str = INDEX_DIR) -> bool:
+        return (os.path.exists(os.path.join(index_dir, EMBEDDINGS_FILE))
+                and os.path.exists(os.path.join(index_dir, IDS_FILE)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def query(self, embedding, n_results: int = 7, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Returns [{"id", "distance"}] best first; distance is cosine distance (same scale as KB_DISTANCE_THRESHOLD).
+        `where` is a Chroma-style metadata filter (see matches_where).
+        """
+        if not self.ids:
+            return []
+
+        rows = None
+        if where:
+            if self.metadata is None:
+                print(f"⚠️ Index at '{self.index_dir}' has no metadata; ignoring filter {where}")
+            else:
+                rows = np.flatnonzero(self.metadata.select(where))
+                if not len(rows):
+                    return []
+
+        positions, scores = self._top_k(normalize_rows(embedding)[0], n_results, rows)
+        return [{"id": self.ids[i], "distance": float(1.0 - score)} for i, score in zip(positions, scores)]
+
+    def _top_k(self, query_vector: np.ndarray, k: int, rows: np.ndarray = None):
+        """(row positions, cosine similarities) of the k best rows, best first; `rows` restricts the search."""
+        scores = (self.embeddings if rows is None else self.embeddings[rows]) @ query_vector
+        top = top_indices(scores, k)
+        return (top if rows is None else rows[top]), scores[top]
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Unit vectors of the given ids (unknown ids are skipped); only those rows are read from the mmap."""
+        if self._rows is None:
+            self._rows = {id_: row for row, id_ in enumerate(self.ids)}
+        found = [id_ for id_ in ids if id_ in self._rows]
+        vectors = self.embeddings[[self._rows[id_] for id_ in found]]
+        return dict(zip(found, vectors))
+
+    @staticmethod
+    def build(ids: List[str], embeddings, index_dir: str = INDEX_DIR, metadatas: List[Dict[str, Any]] = None,
+              quantize: bool = False):
+        """
+        Writes a fresh index; `metadatas` (one dict per id) adds the filter bitmask and `quantize`
+        the int8 codes read by QuantizedNumpyVectorIndex.
+        Files are written to temp names and renamed, so readers never see half a file.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        matrix = normalize_rows(embeddings) if len(ids) else np.zeros((0, 0), dtype=np.float32)
+
+        embeddings_path = os.path.join(index_dir, EMBEDDINGS_FILE)
+        ids_path = os.path.join(index_dir, IDS_FILE)
+
+        with open(embeddings_path + ".tmp", "wb") as f:
+            np.save(f, matrix)
+        with open(ids_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(list(ids), f)
+
+        os.replace(embeddings_path + ".tmp", embeddings_path)
+        os.replace(ids_path + ".tmp", ids_path)
+
+        if metadatas is not None:
+            MetadataBitmask.encode(metadatas).save(index_dir)
+        else:
+            _remove_files(index_dir, METADATA_MASKS_FILE, METADATA_BITS_FILE)  # masks from an older build would not line up
+
+        if quantize:
+            codes, scale = quantize_int8(matrix)
+            for name, array in ((CODES_FILE, codes), (CODE_SCALE_FILE, scale)):
+                path = os.path.join(index_dir, name)
+                with open(path + ".tmp", "wb") as f:
+                    np.save(f, array)
+                os.replace(path + ".tmp", path)
+        else:
+            _remove_files(index_dir, CODES_FILE, CODE_SCALE_FILE)
+
+    @staticmethod
+    def has_metadata(index_dir: str = INDEX_DIR) -> bool:
+        return MetadataBitmask.exists(index_dir)
+
+
+class QuantizedNumpyVectorIndex(NumpyVectorIndex):
+    """
+    NumpyVectorIndex that scans int8 codes instead of the float32 matrix: a quarter of the
+    bytes to keep resident for a large corpus. The scan widens SCAN_CHUNK_ROWS codes at a time into
+    one reusable float32 buffer (never the whole matrix), keeps the best k * rescore_factor
+    candidates, and rescores those exactly against the float rows, which stay on disk in the
+    mmap and are only paged in for the candidates. Filters and get_vectors work as in the parent.
+    """
+
+    def __init__(self, index_dir: str = INDEX_DIR, rescore_factor: int = RESCORE_FACTOR):
+        super().__init__(index_dir)
+        self.codes = np.load(os.path.join(index_dir, CODES_FILE), mmap_mode="r")
+        self.scale = np.load(os.path.join(index_dir, CODE_SCALE_FILE))
+        self.rescore_factor = rescore_factor
+        if self.codes.shape != self.embeddings.shape:
+            raise ValueError(f"Index at '{index_dir}' is inconsistent: "
+                             f"int8 codes {self.codes.shape} vs vectors {self.embeddings.shape}")
+
+    @staticmethod
+    def exists(index_dir: str = INDEX_DIR) -> bool:
+        return (NumpyVectorIndex.exists(index_dir)
+                and os.path.exists(os.path.join(index_dir, CODES_FILE))
+                and os.path.exists(os.path.join(index_dir, CODE_SCALE_FILE)))
+
+    def approximate_top_k(self, query_vector: np.ndarray, k: int, rows: np.ndarray = None):
+        """(row positions, approximate similarities) of the k best rows by their int8 codes, best first."""
+        scaled_query = (query_vector * self.scale).astype(np.float32)
+        total = len(self.ids) if rows is None else len(rows)
+        scores = np.empty(total, dtype=np.float32)
+        buffer = np.empty((min(SCAN_CHUNK_ROWS, total), self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, total, SCAN_CHUNK_ROWS):
+            end = min(start + SCAN_CHUNK_ROWS, total)
+            block = buffer[:end - start]
+            block[...] = self.codes[start:end] if rows is None else self.codes[rows[start:end]]
+            np.dot(block, scaled_query, out=scores[start:end])
+        top = top_indices(scores, k)
+        return (top if rows is None else rows[top]), scores[top]
+
+    def _top_k(self, query_vector: np.ndarray, k: int, rows: np.ndarray = None):
+        candidates, _ = self.approximate_top_k(query_vector, k * self.rescore_factor, rows)
+        candidates = np.sort(candidates)  # ascending rows read the mmap sequentially
+        exact = self.embeddings[candidates] @ query_vector
+        top = top_indices(exact, k)
+        return candidates[top], exact[top]
+
+
+def _remove_files(index_dir: str, *names: str):
+    for name in names:
+        if os.path.exists(os.path.join(index_dir, name)):
+            os.remove(os.path.join(index_dir, name))
+
+
+class ChromaVectorIndex:
+    """Chroma server backend (the original setup). Queries go over HTTP to the Chroma process; records hold ids + vectors only."""
+    remote = True
+
+    def __init__(self, collection_name: str = "recipestest", host: str = "localhost", port: int = 8000,
+                 embedding_function=None):
+        self.collection_name = collection_name
+        self.host = host
+        self.port = port
+        self.embedding_function = embedding_function
+        self._client = None
+        self._collection = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = chromadb.HttpClient(host=self.host, port=self.port)
+        return self._client
+
+    def get_collection(self):
+        if self._collection is None:
+            try:
+                self._collection = self.client.get_collection(self.collection_name,
+                                                              embedding_function=self.embedding_function)
+            except chromadb.errors.InvalidCollectionException:
+                return None
+        return self._collection
+
+    def query(self, embedding, n_results: int = 7, where: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Returns [{"id", "distance"}] best first, cosine distance like NumpyVectorIndex.query.
+        Only ids and distances come back over the wire; `where` is applied by Chroma inside the search.
+        """
+        collection = self.get_collection()
+        if collection is None:
+            return []
+
+        results = collection.query(
+            query_embeddings=normalize_rows(embedding).tolist(),
+            n_results=n_results,
+            where=to_chroma_where(where),
+            include=["distances"]
+        )
+
+        return [
+            {"id": id_, "distance": distance}
+            for id_, distance in zip(results["ids"][0], results["distances"][0])
+        ]
+
+    def get_vectors(self, ids: List[str]) -> Dict[str, np.ndarray]:
+        """Unit vectors of the given ids, fetched from the Chroma server in one call."""
+        collection = self.get_collection()
+        if collection is None or not ids:
+            return {}
+        results = collection.get(ids=list(ids), include=["embeddings"])
+        return dict(zip(results["ids"], normalize_rows(results["embeddings"])))
@@ -149,6 +149,7 @@ function Chat() {
     const mediaRecorderRef = useRef(null);
     const recordedChunksRef = useRef([]);
     const messageListRef = useRef(null);
+    const streamingIdRef = useRef(null); // id of the bot bubble receiving "delta" tokens
 
     // Effect for WebSocket auto-reconnect
     useEffect(() => {
@@ -233,6 +234,30 @@ function Chat() {
             try {
                 const data = JSON.parse(event.data);
 
+                if (data.type === "delta") {
+                    setShowThinking(false);
+                    if (streamingIdRef.current === null) {
+                        const id = Date.now();
+                        streamingIdRef.current = id;
+                        setMessages((prev) => [...prev, { id, sender: 'bot', text: data.message }]);
+                    } else {
+                        const id = streamingIdRef.current;
+                        setMessages((prev) => prev.map((msg) =>
+                            msg.id === id ? { ...msg, text: msg.text + data.message } : msg
+                        ));
+                    }
+                    return;
+                }
+
+                if (data.type === "error" || data.type === "reconnect") {
+                    // Drop a partially streamed reply; the error message replaces it
+                    const id = streamingIdRef.current;
+                    streamingIdRef.current = null;
+                    if (id !== null) {
+                        setMessages((prev) => prev.filter((msg) => msg.id !== id));
+                    }
+                }
+
                 if (data.type === "error") {
                     setShowThinking(false);
                     setAwaitingResponse(false);
@@ -268,13 +293,22 @@ function Chat() {
 
                 } else if (data.type === "response") {
                     setShowThinking(false);
-                    const fullMessage = {
-                        id: Date.now(), // Unique ID for keying in React
-                        sender: 'bot',
-                        text: data.message,
-                        sourceUrl: data.sourceUrl // <-- Add this line to capture the URL
-                    };
-                    animateTyping(fullMessage);
+                    const streamedId = streamingIdRef.current;
+                    streamingIdRef.current = null;
+                    if (streamedId !== null) {
+                        // Already shown token by token: settle the bubble on the final text
+                        setMessages((prev) => prev.map((msg) =>
+                            msg.id === streamedId ? { ...msg, text: data.message, sourceUrl: data.sourceUrl } : msg
+                        ));
+                    } else {
+                        const fullMessage = {
+                            id: Date.now(), // Unique ID for keying in React
+                            sender: 'bot',
+                            text: data.message,
+                            sourceUrl: data.sourceUrl // <-- Add this line to capture the URL
+                        };
+                        animateTyping(fullMessage);
+                    }
                     setAwaitingResponse(false);
                     // just in case there's no TTS
                     if (mode === "voice") {